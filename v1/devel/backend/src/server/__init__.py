@@ -12,12 +12,20 @@ from itsdangerous import URLSafeTimedSerializer
 from docutils.core import publish_parts
 from flask.wrappers import Request
 
+from .checkin import CheckinBuffer, ConfigCache
+from .jsonprovider import FastJSONProvider, output_json
+from .tilecache import TileCache
+from .queries import QueryRegistry
+from .sites import SiteDirectory
+from .mailqueue import MailQueue
+from .roles import RoleCache
+from .revoked import RevokedTokens
+from .auditlog import AuditLog
+from .schedule import CheckinSchedule
+
 import os
-import json
 import uuid
 import logging
-import decimal
-import datetime
 
 logging.basicConfig(level=logging.INFO)
 logging.getLogger('sqlalchemy.engine.base').setLevel(logging.WARN)
@@ -30,6 +38,16 @@ socketio = SocketIO()
 jwt = JWTManager()
 mail = Mail()
 pages = FlatPages()
+checkins = CheckinBuffer()
+configs = ConfigCache()
+tiles = TileCache()
+queries = QueryRegistry()
+sites = SiteDirectory()
+mailqueue = MailQueue()
+roles = RoleCache()
+revoked = RevokedTokens()
+audit = AuditLog()
+schedule = CheckinSchedule()
 
 #-- Helper classes ----------------------------------------------------
 
@@ -50,15 +68,6 @@ class ReverseProxy(object):
 
         return self.app(environ,start_response)
 
-class Encoder(json.JSONEncoder):
-    def default(self,o):
-        if isinstance(o,decimal.Decimal):
-            return float(o)
-        elif isinstance(o,datetime.datetime):
-            #return o.isoformat()
-            return int(o.strftime('%s'))
-        return super(Encoder,self).default(o)
-
 def rst_renderer(text):
     parts = publish_parts(source=text, writer_name='html')
     return parts['html_body']
@@ -86,7 +95,7 @@ def create_app():
 
     app.config.from_object('server.config.%s' % mode.capitalize())
     app.wsgi_app = ReverseProxy(app)
-    app.json_encoder = Encoder
+    app.json = FastJSONProvider(app)
     app.request_class = AnyJsonRequest
 
     logging.info('ROOT=%s' % root)
@@ -124,6 +133,16 @@ def create_app():
     socketio.init_app(app,path=root+'/api/socket.io')
     jwt.init_app(app)
     pages.init_app(app)
+    checkins.init_app(app)
+    configs.init_app(app)
+    tiles.init_app(app)
+    queries.init_app(app)
+    sites.init_app(app)
+    mailqueue.init_app(app)
+    roles.init_app(app)
+    revoked.init_app(app)
+    audit.init_app(app)
+    schedule.init_app(app)
     ProxyFix(app)
 
     app.ts = URLSafeTimedSerializer(app.config["SECRET_KEY"])
@@ -153,3 +172,8 @@ def load_blueprints(app):
     app.register_blueprint(admin.bp,url_prefix='/api/admin')
     app.register_blueprint(mesh.bp,url_prefix='/api/mesh')
 
+    # flask-restful has its own encoder, use the app provider instead
+
+    for module in [auth, admin, mesh]:
+        module.api.representation('application/json')(output_json)
+
@@ -0,0 +1,43 @@
+##########################################################################
+#
+#   Write-behind audit log
+#
+#   history.add_entry() used to commit each History row on its own,
+#   adding a second commit to every signup, activation and approval.
+#   Entries are now queued in memory, stamped with the time they were
+#   recorded, and inserted together with one bulk INSERT (see
+#   writebehind.py for when the queue is flushed).
+#
+##########################################################################
+
+from .writebehind import WriteBehind
+
+import datetime
+
+class AuditLog(WriteBehind):
+
+    extension = 'audit'
+    config_prefix = 'AUDIT'
+    thread_name = 'audit-flush'
+    error_message = 'Failed to write audit entries'
+
+    interval = 2
+    max_size = 200
+
+    def record(self, username, action):
+        """Queue a history entry for username"""
+
+        self.queue(dict(
+            username=username,
+            action=action[:255],
+            timestamp=datetime.datetime.now()
+            ))
+
+    def write(self, batch):
+        """Write the queued entries with a single INSERT"""
+
+        from .model import db, History
+
+        with self.app.app_context():
+            with db.engines['users'].begin() as conn:
+                conn.execute(History.__table__.insert(), batch)
@@ -0,0 +1,164 @@
+##########################################################################
+#
+#   Write-behind buffer for node checkin timestamps
+#
+#   Every node checks in once a minute. Rather than commit a single row
+#   UPDATE for each heartbeat, we keep the latest checkin time for each
+#   node in memory and write them out together with one bulk UPDATE
+#   (see writebehind.py for when the buffer is flushed).
+#
+#   A checkin is never held in memory for longer than the interval.
+#   Readers should use checked_on() to merge in any buffered value.
+#
+#   The UPDATE never moves checked_on backwards, so an older batch from
+#   another worker landing late is harmless.
+#
+#   Only checked_on is written, a heartbeat does not bump the node's
+#   revision or it would show up in every /changes poll. Liveness is
+#   read from /checkins instead.
+#
+##########################################################################
+
+from sqlalchemy import text
+
+from .writebehind import WriteBehind
+
+import datetime
+import logging
+import os
+import threading
+
+class CheckinBuffer(WriteBehind):
+
+    extension = 'checkins'
+    config_prefix = 'CHECKIN'
+    thread_name = 'checkin-flush'
+    error_message = 'Failed to flush node checkins'
+
+    interval = 15
+    max_size = 500
+
+    def empty(self):
+        return {}
+
+    def add(self, pending, item):
+        uuid, timestamp = item
+        pending[uuid] = timestamp
+
+    def restore(self, pending, batch):
+        # Keep any newer checkins
+        for uuid, timestamp in batch.items():
+            pending.setdefault(uuid, timestamp)
+
+    def record(self, uuid, timestamp=None):
+        """Record a checkin for node uuid"""
+
+        if timestamp is None:
+            timestamp = datetime.datetime.utcnow()
+
+        self.queue((uuid, timestamp))
+
+    def checked_on(self, uuid, default=None):
+        """Latest checkin time, including any not yet written"""
+
+        with self.lock:
+            return self.pending.get(uuid, default)
+
+    def since(self, cutoff):
+        """Buffered checkins newer than cutoff as {uuid: timestamp}"""
+
+        with self.lock:
+            return {uuid: timestamp for uuid, timestamp in self.pending.items()
+                        if timestamp > cutoff}
+
+    def write(self, batch):
+        """Write the buffered checkins with a single UPDATE"""
+
+        values = []
+        params = {}
+
+        for index, (uuid, timestamp) in enumerate(batch.items()):
+            values.append(f'(:uuid_{index}, :checked_on_{index})')
+            params[f'uuid_{index}'] = uuid
+            params[f'checked_on_{index}'] = timestamp
+
+        sql = text(
+            'update mesh_node set '
+            'checked_on=greatest(mesh_node.checked_on, data.checked_on) '
+            'from (values %s) as data(uuid, checked_on) '
+            'where mesh_node.uuid=data.uuid' % ','.join(values)
+            )
+
+        from server import db
+
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(sql, params)
+
+##########################################################################
+#
+#   Per-process cache of node checkin responses
+#
+#   The checkin response only changes when an admin edits the node or
+#   its group, so we keep the resolved response for each node and drop
+#   it when one of the write paths calls invalidate(). The CLI runs in
+#   a separate process, so invalidate() also touches a stamp file in the
+#   instance folder. Any process that sees the stamp change clears its
+#   entire cache.
+#
+##########################################################################
+
+class ConfigCache(object):
+
+    stampname = 'checkin.stamp'
+    extension = 'configs'
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.stampfile = None
+        self.stamp = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.stampfile = os.path.join(app.instance_path, self.stampname)
+        self.stamp = self.read_stamp()
+
+        app.extensions[self.extension] = self
+
+    def read_stamp(self):
+        try:
+            return os.stat(self.stampfile).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    def get(self, uuid):
+        stamp = self.read_stamp()
+
+        with self.lock:
+            if stamp != self.stamp:
+                self.entries.clear()
+                self.stamp = stamp
+            return self.entries.get(uuid)
+
+    def set(self, uuid, config):
+        with self.lock:
+            self.entries[uuid] = config
+
+    def invalidate(self, uuid=None):
+        """Drop the cached config for uuid (or all nodes)"""
+
+        with self.lock:
+            if uuid is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(uuid, None)
+
+        if self.stampfile:
+            try:
+                with open(self.stampfile, 'a'):
+                    os.utime(self.stampfile)
+            except OSError:
+                logging.exception('Failed to touch %s' % self.stampfile)
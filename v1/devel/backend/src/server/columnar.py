@@ -0,0 +1,133 @@
+##########################################################################
+#
+#   Packed columnar encoding for large query results
+#
+#   A compact binary alternative to row oriented JSON for the radar and
+#   track data. Each column is sent as a contiguous little-endian typed
+#   array that can be wrapped directly with a JavaScript TypedArray or
+#   numpy.frombuffer. The stream is written in batches so it can be
+#   produced from a server side cursor:
+#
+#       header  "TCOL" uint32 length, JSON description, padding
+#       batch   uint32 rows, 4 bytes padding, one array per column
+#       ...
+#       end     batch with 0 rows
+#
+#   The JSON description is {"columns": [{"name": .., "type": ..}]}
+#   with the types int64, float32 or float64. Every block is padded to
+#   a multiple of 8 bytes so all of the arrays are aligned. Missing
+#   values are NaN for float columns and the smallest int64 value
+#   (-2**63, MISSING['int64']) for integer columns, so they can not be
+#   mistaken for a real 0.
+#
+##########################################################################
+
+from .jsonprovider import dumpb, loads
+
+import array
+import struct
+import sys
+
+MIMETYPE = 'application/x-tincan-columns'
+MAGIC = b'TCOL'
+
+TYPECODES = {
+    'int64':    'q',
+    'float32':  'f',
+    'float64':  'd'
+}
+
+MISSING = {
+    'int64':    -2**63,
+    'float32':  float('nan'),
+    'float64':  float('nan')
+}
+
+def pad(data):
+    return data + b'\0' * (-len(data) % 8)
+
+def encode_header(columns):
+
+    description = dumpb({'columns': [
+        {'name': name, 'type': kind} for name, kind in columns
+        ]})
+
+    return pad(MAGIC + struct.pack('<I', len(description)) + description)
+
+def encode_column(kind, values):
+
+    if None in values:
+        values = [MISSING[kind] if v is None else v for v in values]
+
+    data = array.array(TYPECODES[kind], values)
+
+    if sys.byteorder == 'big':
+        data.byteswap()
+
+    return pad(data.tobytes())
+
+def restore_missing(columns, arrays):
+    """Arrays with the int64 missing value turned back into None"""
+
+    marker = MISSING['int64']
+
+    return [[None if v == marker else v for v in values]
+            if kind == 'int64' and marker in values else values
+            for (name, kind), values in zip(columns, arrays)]
+
+def encode_columns(columns, count, values):
+    """Batch from one sequence of values per column"""
+
+    parts = [struct.pack('<I4x', count)]
+
+    if count:
+        for (name, kind), column in zip(columns, values):
+            parts.append(encode_column(kind, column))
+
+    return b''.join(parts)
+
+def encode_batch(columns, rows):
+    return encode_columns(columns, len(rows), zip(*rows))
+
+def encode_stream(columns, chunks):
+    """Columns are (name, type) pairs matching the order in each row"""
+
+    yield encode_header(columns)
+
+    for rows in chunks:
+        if rows:
+            yield encode_batch(columns, rows)
+
+    yield encode_batch(columns, [])
+
+def decode(data):
+    """Columns and one array per column from an encoded stream"""
+
+    if data[:4] != MAGIC:
+        raise ValueError('Not a packed column stream')
+
+    length, = struct.unpack_from('<I', data, 4)
+    description = loads(data[8:8+length])
+
+    columns = [(c['name'], c['type']) for c in description['columns']]
+    arrays = [array.array(TYPECODES[kind]) for name, kind in columns]
+
+    offset = 8 + length + (-(8+length) % 8)
+
+    while True:
+        count, = struct.unpack_from('<I', data, offset)
+        offset += 8
+
+        if not count:
+            break
+
+        for values in arrays:
+            size = count * values.itemsize
+            values.frombytes(data[offset:offset+size])
+            offset += size + (-size % 8)
+
+    if sys.byteorder == 'big':
+        for values in arrays:
+            values.byteswap()
+
+    return columns, arrays
@@ -4,7 +4,7 @@ import sqlalchemy
 from flask import current_app
 from flask.cli import FlaskGroup, with_appcontext, pass_script_info
 
-from . import create_app, db, socketio
+from . import create_app, db, socketio, mailqueue, roles
 
 ##########################################################################
 # Helper functions
@@ -156,6 +156,7 @@ def user_del(username):
     print('Deleting user:  %s' % username)
     db.session.delete(user)
     db.session.commit()
+    roles.invalidate(username)
 
 @user.command('mod')
 @click.argument('username')
@@ -205,6 +206,8 @@ def user_mod(username,pending,active,email,password,rolename):
         db.session.rollback()
         return
 
+    roles.invalidate(username)
+
 @user.command('show')
 @click.argument('username')
 def user_show(username):
@@ -324,6 +327,47 @@ def role_show(name):
 
     print()
 
+##########################################################################
+#   Mail queue
+##########################################################################
+
+@cli.group()
+def mail():
+    """
+    Inspect and send the outbound mail queue
+    """
+
+@mail.command('list')
+def mail_list():
+
+    fmt = '%05s %-20s %-30s %-8s %-20s %s'
+    timefmt = '%Y-%m-%d %H:%M:%S'
+
+    print()
+    print(fmt % ('ID','Created','Recipients','Attempts','Next attempt','Last error'))
+    print( '-'*120)
+
+    table = current_app.model.OutboundMail
+
+    for entry in table.query.order_by(table.id).all():
+        created = entry.created_on.strftime(timefmt)
+        send_after = entry.send_after.strftime(timefmt)
+        error = (entry.last_error or '').splitlines()[:1]
+        print(fmt % (entry.id,created,entry.recipients,entry.attempts,send_after,''.join(error)))
+
+    print()
+
+@mail.command('flush')
+@click.option('-r','--retry',is_flag=True,help='Also retry messages that are waiting or gave up')
+def mail_flush(retry):
+
+    if retry:
+        table = current_app.model.OutboundMail
+        table.query.update({'send_after': table.created_on, 'attempts': 0})
+        db.session.commit()
+
+    mailqueue.try_dispatch()
+
 @cli.command('seed')
 def seed():
     """Add default entries to the database"""
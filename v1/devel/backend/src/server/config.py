@@ -31,10 +31,23 @@ class Config(object):
     MAIL_SERVER = 'localhost'
     MAIL_DEFAULT_SENDER = 'no-reply@mangonetwork.org'
 
+    # Outbound mail is queued and sent in the background (mailqueue.py)
+
+    MAIL_QUEUE_INTERVAL = 30
+    MAIL_QUEUE_BATCH = 50
+    MAIL_RETRY_DELAY = 60
+    MAIL_RETRY_MAX_DELAY = 3600
+    MAIL_MAX_ATTEMPTS = 10
+
     JWT_ALGORITHM = 'HS256'
     JWT_HEADER_TYPE = 'bearer'
     JWT_TOKEN_LOCATION = ('headers','json')
 
+    # Revoked tokens are cached in memory (seconds, see revoked.py)
+
+    REVOKED_REFRESH = 30
+    REVOKED_PURGE_INTERVAL = 3600
+
     TEMPLATES_AUTO_RELOAD = True
 
     STATIC_FOLDER = 'server/templates/static'
@@ -44,8 +57,57 @@ class Config(object):
     SQLALCHEMY_URI = f'postgresql://@'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Node checkins are written in batches (seconds, number of nodes)
+
+    CHECKIN_FLUSH_INTERVAL = 15
+    CHECKIN_FLUSH_SIZE = 500
+
+    # Deleted groups and nodes are listed in /changes for this many days
+
+    MESH_TOMBSTONE_DAYS = 30
+
+    # Checkin replies tell the node when to come back (seconds, see
+    # schedule.py). The target rate is checkins per second per worker.
+
+    CHECKIN_INTERVAL = 60
+    CHECKIN_PENDING_INTERVAL = 15
+    CHECKIN_IDLE_INTERVAL = 300
+    CHECKIN_MAX_INTERVAL = 300
+    CHECKIN_JITTER = 0.25
+    CHECKIN_TARGET_RATE = 50
+    CHECKIN_STATS_WINDOW = 600
+
+    # History entries are written in batches (seconds, number of entries)
+
+    AUDIT_FLUSH_INTERVAL = 2
+    AUDIT_FLUSH_SIZE = 200
+
+    # SSH key lookup service used by sshd (bin/tincan_keylookup)
+
+    KEYLOOKUP_SOCKET = '/run/tincan/keylookup.sock'
+    KEYLOOKUP_REFRESH = 300
+
+    # Rows per fetch when streaming radar and track data
+
+    STREAM_CHUNK_SIZE = 5000
+
+    # Radar and track data are cached in time tiles (see tilecache.py).
+    # Tiles are written to TILE_CACHE_DIR when set, nothing removes
+    # them so use a tmpfiles.d entry or similar to age them out.
+
+    TILE_SECONDS = 600
+    TILE_SETTLE = 300
+    TILE_CACHE_BYTES = 256*2**20
+    TILE_CACHE_DIR = None
+
+    # Site name to id lookups (seconds between refreshes, and after a miss)
+
+    SITE_CACHE_TTL = 300
+    SITE_CACHE_RETRY = 10
+
     COMPRESS_MIMETYPES = ['text/html', 'text/css', 'text/xml',
                           'text/javascript', 'application/json',
+                          'application/x-ndjson',
                           'application/javascript','application/x-javascript']
 
 class Production(Config):
@@ -66,3 +128,17 @@ class Development(Config):
         'users':    f'{PREFIX}-users-devel'
     }
 
+class Testing(Config):
+
+    # In memory SQLite unless pointed at a scratch Postgres database
+
+    TESTING = True
+
+    SQLALCHEMY_DATABASE_URI = os.getenv('TINCAN_TEST_DB', 'sqlite://')
+    SQLALCHEMY_BINDS = {
+        'users':    os.getenv('TINCAN_TEST_USERS_DB', 'sqlite://')
+    }
+
+    # Cheap password hashes for the test users
+
+    BCRYPT_LOG_ROUNDS = 4
@@ -0,0 +1,129 @@
+##########################################################################
+#
+#   JSON provider for Flask and flask-restful
+#
+#   One encoder for jsonify() and the flask-restful resources. Uses
+#   orjson if it is installed (pip install tincan[json]) and falls back
+#   to the standard library otherwise. Both produce the same output:
+#
+#       datetime    - integer seconds since 1970 (naive values are UTC)
+#       date        - ISO 8601 string
+#       Decimal     - float
+#       NaN, inf    - null
+#
+##########################################################################
+
+from flask import current_app
+from flask.json.provider import JSONProvider
+
+import calendar
+import datetime
+import decimal
+import json
+import math
+import uuid
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def epoch(value):
+    """Datetime as integer seconds since 1970 (naive values are UTC)"""
+
+    if value.tzinfo is None:
+        return calendar.timegm(value.timetuple())
+
+    return int(value.timestamp())
+
+def default(o):
+
+    if isinstance(o, datetime.datetime):
+        return epoch(o)
+
+    if isinstance(o, decimal.Decimal):
+        return float(o) if o.is_finite() else None
+
+    if isinstance(o, datetime.date):
+        return o.isoformat()
+
+    if isinstance(o, uuid.UUID):
+        return str(o)
+
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+def sanitize(obj):
+    """Replace NaN and infinity with None (stdlib fallback only)"""
+
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+
+    if isinstance(obj, dict):
+        return {k: sanitize(v) for k, v in obj.items()}
+
+    if isinstance(obj, (list, tuple)):
+        return [sanitize(v) for v in obj]
+
+    if isinstance(obj, decimal.Decimal):
+        return default(obj)
+
+    return obj
+
+if orjson:
+
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumpb(obj, indent=False):
+        options = ORJSON_OPTIONS
+
+        if indent:
+            options |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(obj, default=default, option=options)
+
+    def loads(s):
+        return orjson.loads(s)
+
+else:
+
+    def dumpb(obj, indent=False):
+        kwargs = {'indent': 2} if indent else {'separators': (',', ':')}
+
+        # Fast path, only walk the data if it has NaN or infinity
+
+        try:
+            payload = json.dumps(obj, default=default, allow_nan=False, **kwargs)
+        except ValueError:
+            payload = json.dumps(sanitize(obj), default=default, **kwargs)
+
+        return payload.encode('utf-8')
+
+    def loads(s):
+        return json.loads(s)
+
+def dumps(obj):
+    return dumpb(obj).decode('utf-8')
+
+class FastJSONProvider(JSONProvider):
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumpb(obj, indent=kwargs.get('indent')).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        payload = dumpb(obj, indent=self._app.debug) + b'\n'
+        return self._app.response_class(payload, mimetype=self.mimetype)
+
+def output_json(data, code, headers=None):
+    """flask-restful representation using the application provider"""
+
+    response = current_app.json.response(data)
+    response.status_code = code
+    response.headers.extend(headers or {})
+
+    return response
@@ -0,0 +1,148 @@
+##########################################################################
+#
+#   SSH key lookup service
+#
+#   sshd calls AuthorizedKeysCommand (bin/tincan_keylookup) on every
+#   inbound connection. Rather than start the Flask application each
+#   time, this long running service keeps the active keys for each
+#   ssh_user in memory and answers requests on a local Unix socket.
+#
+#   Protocol (one request per connection):
+#
+#       client: <username> [<keytype> <fingerprint>]\n
+#       server: <public key>\n ... (closes connection)
+#
+#   With a key type and fingerprint (sshd's %t %f), only the matching
+#   key is returned.
+#
+#   The keys are reloaded whenever the mesh tables are changed through
+#   the API or CLI (see ConfigCache.invalidate) and every refresh
+#   seconds as a fallback.
+#
+##########################################################################
+
+from server import db, model, configs
+
+import logging
+import os
+import socketserver
+import threading
+import time
+
+class KeyDirectory(object):
+
+    def __init__(self, app, poll=1, refresh=300):
+        self.app = app
+        self.poll = poll
+        self.refresh = refresh
+        self.keys = {}
+        self.fingerprints = {}
+        self.loaded = 0
+        self.stamp = None
+
+    def load(self):
+        with self.app.app_context():
+            stamp = configs.read_stamp()
+
+            rows = db.session.query(
+                    model.MeshGroup.ssh_user,
+                    model.MeshNode.sshkey,
+                    model.MeshNode.sshkey_fingerprint
+                ).join(
+                    model.MeshNode, model.MeshNode.group_id==model.MeshGroup.id
+                ).filter(
+                    model.MeshNode.active==True,
+                    model.MeshNode.sshkey!=''
+                ).all()
+
+            db.session.remove()
+
+        keys = {}
+        fingerprints = {}
+
+        for ssh_user, sshkey, fingerprint in rows:
+            keys.setdefault(ssh_user, []).append(sshkey)
+            fingerprints[ssh_user, fingerprint] = sshkey
+
+        # Swap in the new directory in one step, readers never lock
+
+        self.keys = keys
+        self.fingerprints = fingerprints
+        self.stamp = stamp
+        self.loaded = time.monotonic()
+
+        logging.info('Loaded %d keys for %d users' % (len(rows), len(keys)))
+
+    def lookup(self, username, keytype=None, fingerprint=None):
+
+        if not fingerprint:
+            return self.keys.get(username, [])
+
+        fingerprint = model.normalize_fingerprint(fingerprint)
+        sshkey = self.fingerprints.get((username, fingerprint))
+
+        if sshkey and sshkey.split()[0]==keytype:
+            return [sshkey]
+
+        return []
+
+    def watch(self):
+        while True:
+            time.sleep(self.poll)
+
+            with self.app.app_context():
+                stamp = configs.read_stamp()
+
+            expired = time.monotonic() - self.loaded >= self.refresh
+
+            if stamp == self.stamp and not expired:
+                continue
+
+            try:
+                self.load()
+            except Exception:
+                logging.exception('Failed to reload SSH keys')
+
+class KeyLookupHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        request = self.rfile.readline(1024).decode('utf-8', 'replace').split()
+
+        if not request:
+            return
+
+        for sshkey in self.server.directory.lookup(*request[:3]):
+            self.wfile.write(sshkey.encode('utf-8') + b'\n')
+
+class KeyLookupServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, path, directory):
+        self.directory = directory
+
+        if os.path.exists(path):
+            os.remove(path)
+
+        socketserver.UnixStreamServer.__init__(self, path, KeyLookupHandler)
+
+        # sshd runs AuthorizedKeysCommand as an unprivileged user
+
+        os.chmod(path, 0o666)
+
+def serve(app, path, poll=1, refresh=300):
+
+    directory = KeyDirectory(app, poll=poll, refresh=refresh)
+    directory.load()
+
+    watcher = threading.Thread(target=directory.watch, name='keylookup-watch')
+    watcher.daemon = True
+    watcher.start()
+
+    logging.info('Listening on %s' % path)
+
+    with KeyLookupServer(path, directory) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
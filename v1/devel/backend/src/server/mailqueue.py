@@ -0,0 +1,234 @@
+##########################################################################
+#
+#   Outbound mail queue
+#
+#   Request handlers add messages to the mail_queue table and return
+#   right away. A background thread sends the queued messages in
+#   batches over a single SMTP connection, so a slow or unavailable
+#   mail server never holds up an API worker and nothing is lost if
+#   the process restarts.
+#
+#   A message that fails is retried after MAIL_RETRY_DELAY seconds,
+#   doubling on each attempt up to MAIL_RETRY_MAX_DELAY. After
+#   MAIL_MAX_ATTEMPTS it is left in the table with the last error.
+#
+#   The SMTP settings are the Flask-Mail ones (MAIL_SERVER, MAIL_PORT,
+#   MAIL_USE_TLS, MAIL_USE_SSL, MAIL_USERNAME, MAIL_PASSWORD).
+#
+##########################################################################
+
+from email.utils import parseaddr, formataddr
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import atexit
+import datetime
+import logging
+import smtplib
+import threading
+
+def envelope_address(address):
+    if isinstance(address, (tuple, list)):
+        address = formataddr(address)
+    return parseaddr(address)[1]
+
+class MailQueue(object):
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 30
+        self.batch_size = 50
+        self.retry_delay = 60
+        self.retry_max_delay = 3600
+        self.max_attempts = 10
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('MAIL_QUEUE_INTERVAL', self.interval)
+        self.batch_size = app.config.get('MAIL_QUEUE_BATCH', self.batch_size)
+        self.retry_delay = app.config.get('MAIL_RETRY_DELAY', self.retry_delay)
+        self.retry_max_delay = app.config.get('MAIL_RETRY_MAX_DELAY', self.retry_max_delay)
+        self.max_attempts = app.config.get('MAIL_MAX_ATTEMPTS', self.max_attempts)
+
+        # Pick up anything left in the queue once the app is serving
+
+        app.before_request(self.start)
+
+        if not event.contains(Session, 'after_commit', self.committed):
+            event.listen(Session, 'after_commit', self.committed)
+            event.listen(Session, 'after_rollback', self.rolled_back)
+
+        app.extensions['mailqueue'] = self
+        atexit.register(self.stop)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name='mail-queue')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.try_dispatch()
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+    def try_dispatch(self):
+        try:
+            while self.dispatch() == self.batch_size:
+                pass
+        except Exception:
+            logging.exception('Failed to send queued mail')
+
+    #-- Queue -------------------------------------------------------------
+
+    def enqueue(self, message, sender=None, recipients=None):
+        """Queue a Flask-Mail or email.message Message for delivery
+
+        The envelope sender and recipients default to the ones in a
+        Flask-Mail message. The message is added to the request's
+        session and goes out once the caller commits, so it is only
+        sent if the change it reports is saved as well.
+        """
+
+        from .model import db, OutboundMail
+
+        sender = sender or message.sender
+        recipients = recipients or message.send_to
+
+        entry = OutboundMail(
+            sender=envelope_address(sender),
+            recipients=','.join(envelope_address(r) for r in recipients),
+            message=message.as_string()
+            )
+
+        db.session.add(entry)
+        db.session.flush()
+        db.session.info['mail_queued'] = True
+
+        self.start()
+
+    def committed(self, session):
+        # Wake the sender once queued mail is committed
+
+        if session.info.pop('mail_queued', False):
+            self.wake.set()
+
+    def rolled_back(self, session):
+        session.info.pop('mail_queued', None)
+
+    def backoff(self, attempts):
+        delay = min(self.retry_delay * 2**(attempts-1), self.retry_max_delay)
+        return datetime.timedelta(seconds=delay)
+
+    def defer(self, entry, error):
+        entry.attempts += 1
+        entry.last_error = str(error)
+        entry.send_after = datetime.datetime.utcnow() + self.backoff(entry.attempts)
+
+        logging.warning('Mail %d to %s failed (attempt %d): %s' % (
+            entry.id, entry.recipients, entry.attempts, error))
+
+    #-- Delivery ----------------------------------------------------------
+
+    def connect(self):
+        config = self.app.config
+
+        host = config.get('MAIL_SERVER', 'localhost')
+        port = config.get('MAIL_PORT', 25)
+        timeout = config.get('MAIL_TIMEOUT', 30)
+
+        if config.get('MAIL_USE_SSL'):
+            smtp = smtplib.SMTP_SSL(host, port, timeout=timeout)
+        else:
+            smtp = smtplib.SMTP(host, port, timeout=timeout)
+
+        if config.get('MAIL_USE_TLS'):
+            smtp.starttls()
+
+        if config.get('MAIL_USERNAME'):
+            smtp.login(config['MAIL_USERNAME'], config.get('MAIL_PASSWORD'))
+
+        return smtp
+
+    def dispatch(self):
+        """Send one batch of due messages, returns the batch size"""
+
+        from .model import db, OutboundMail
+
+        with self.app.app_context():
+
+            entries = OutboundMail.query.filter(
+                    OutboundMail.send_after <= datetime.datetime.utcnow(),
+                    OutboundMail.attempts < self.max_attempts
+                ).order_by(
+                    OutboundMail.id
+                ).limit(
+                    self.batch_size
+                ).with_for_update(
+                    skip_locked=True
+                ).all()
+
+            if not entries:
+                db.session.rollback()
+                return 0
+
+            try:
+                smtp = self.connect()
+            except (OSError, smtplib.SMTPException) as error:
+                for entry in entries:
+                    self.defer(entry, error)
+                db.session.commit()
+                return 0
+
+            sent = 0
+
+            try:
+                for pos, entry in enumerate(entries):
+                    try:
+                        smtp.sendmail(
+                            entry.sender,
+                            entry.recipients.split(','),
+                            entry.message.encode('utf-8')
+                            )
+                    except smtplib.SMTPServerDisconnected as error:
+                        # Lost the connection, try the rest again later
+                        for entry in entries[pos:]:
+                            self.defer(entry, error)
+                        break
+                    except smtplib.SMTPException as error:
+                        # Refused by the server (SMTPException is an
+                        # OSError, so this has to come first)
+                        self.defer(entry, error)
+                        continue
+                    except OSError as error:
+                        for entry in entries[pos:]:
+                            self.defer(entry, error)
+                        break
+
+                    db.session.delete(entry)
+                    sent += 1
+            finally:
+                try:
+                    smtp.quit()
+                except (OSError, smtplib.SMTPException):
+                    pass
+
+            db.session.commit()
+
+            logging.info('Sent %d of %d queued messages' % (sent, len(entries)))
+
+            return len(entries)
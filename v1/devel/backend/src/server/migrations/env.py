@@ -73,6 +73,13 @@ def get_metadata(bind):
     return m
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """Skip tables that are managed outside of this app (see model.Site)"""
+    if type_ == 'table' and object.info.get('external'):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -161,6 +168,7 @@ def run_migrations_online():
                 upgrade_token="%s_upgrades" % name,
                 downgrade_token="%s_downgrades" % name,
                 target_metadata=get_metadata(name),
+                include_object=include_object,
                 process_revision_directives=process_revision_directives,
                 **current_app.extensions['migrate'].configure_args
             )
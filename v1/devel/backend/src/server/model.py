@@ -5,11 +5,17 @@ from flask_sqlalchemy.model import BindMetaMixin, Model
 from sqlalchemy.ext.declarative import DeclarativeMeta, declarative_base
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import validates
+from sqlalchemy import event
 from os import urandom
 import string
 import uuid
+import base64
+import binascii
+import hashlib
 
-from . import db, bcrypt
+from . import db, bcrypt, revoked
+from .jsonprovider import epoch
 
 # See http://flask-sqlalchemy.pocoo.org/2.3/customizing/
 # Disabling Table Name Generation
@@ -25,15 +31,85 @@ import datetime
 #   https://stackoverflow.com/questions/7102754/jsonify-a-sqlalchemy-result-set-in-flask
 #-------------------------------------------------------------------------
 
+def json_value(converter, value):
+    return value if value is None else converter(value)
+
 class Serializer(object):
 
-    def serialize(self):
-        return { c: getattr(self, c) for c in inspect(self).attrs.keys()}
+    # Columns left out of serialize(), set in each model
+    serialize_exclude = ()
+
+    @classmethod
+    def serializer(cls):
+        """Column names and value converters, resolved once per model"""
+
+        compiled = cls.__dict__.get('_serializer')
+
+        if compiled is None:
+            compiled = []
+            for attr in inspect(cls).column_attrs:
+                if attr.key in cls.serialize_exclude:
+                    continue
+                column = attr.columns[0]
+                if isinstance(column.type, db.DateTime):
+                    compiled.append((attr.key, epoch))
+                else:
+                    compiled.append((attr.key, None))
+            compiled = tuple(compiled)
+            cls._serializer = compiled
+
+        return compiled
+
+    @classmethod
+    def serialize_columns(cls):
+        return [key for key, converter in cls.serializer()]
+
+    def serialize(self, relationships=()):
+        d = {}
+
+        for key, converter in self.serializer():
+            value = getattr(self, key)
+            d[key] = json_value(converter, value) if converter else value
+
+        # Relationships are only loaded when asked for
+
+        for name in relationships:
+            related = getattr(self, name)
+            if isinstance(related, list):
+                d[name] = [r.serialize() for r in related]
+            else:
+                d[name] = related.serialize() if related is not None else None
+
+        return d
 
     @staticmethod
     def serialize_list(l):
         return [m.serialize() for m in l]
 
+    @classmethod
+    def serialize_rows(cls, rows, columns=None):
+        """Serialize plain result tuples with the given columns 
+        (default is serialize_columns() order) without loading objects"""
+
+        converters = dict(cls.serializer())
+
+        if columns is None:
+            columns = cls.serialize_columns()
+
+        plan = [(index, key, converters.get(key)) 
+                for index, key in enumerate(columns)]
+
+        results = []
+
+        for row in rows:
+            d = {}
+            for index, key, converter in plan:
+                value = row[index]
+                d[key] = json_value(converter, value) if converter else value
+            results.append(d)
+
+        return results
+
 def update_or_add(data, table, primary_keys=None):
 
     attrs = inspect(table).attrs.keys()
@@ -73,17 +149,86 @@ def filter_columns(obj, data):
     return dict((k,v) for k,v in data.items() if k in cols)
 
 #-------------------------------------------------------------------------
-# Reflected data tables
+# Data tables
+#
+#   The science tables are created and loaded outside of this app. Only
+#   the columns used here are declared and migrations skip them.
 #-------------------------------------------------------------------------
 
-#class Site(db.Model):
-#    __tablename__ = 'sites'
-#    __table_args__ = {'autoload':True,'autoload_with':db.engine}
+class Site(db.Model, Serializer):
+
+    __tablename__ = 'sites'
+    __table_args__ = {'info': {'external': True}}
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, unique=True, nullable=False)
 
 #-------------------------------------------------------------------------
 # Mesh tables 
 #-------------------------------------------------------------------------
 
+# Every insert or update of a group or node is stamped with the id of
+# the transaction that wrote it. Clients use it to ask for changes since
+# the last revision they saw (see MeshTombstone for deletes).
+#
+# Transaction ids are handed out when a transaction starts writing, not
+# in commit order, so a reader can see revision 12 before 11 commits.
+# changes_watermark() returns the oldest transaction still in flight,
+# everything below it is committed and visible.
+
+def revision_column():
+    return db.Column(db.BigInteger,
+        server_default=db.text('txid_current()'),
+        onupdate=db.func.txid_current(),
+        nullable=False, index=True
+        )
+
+def changes_watermark():
+    return db.session.execute(
+        db.text('select txid_snapshot_xmin(txid_current_snapshot())')
+        ).scalar()
+
+class MeshTombstone(db.Model):
+    """Deleted mesh groups and nodes"""
+    __tablename__ = 'mesh_tombstone'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String, nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    revision = revision_column()
+    deleted_on = db.Column(db.DateTime(timezone=True),
+                    nullable=False, index=True,
+                    default=datetime.datetime.utcnow,
+                    server_default=db.func.now())
+
+# Tombstones older than MESH_TOMBSTONE_DAYS are purged. The highest
+# purged revision is kept as a single 'horizon' row, a client asking
+# for changes from before it has to reload the full list.
+
+TOMBSTONE_HORIZON = 'horizon'
+
+def purge_tombstones(connection, days):
+    """Remove tombstones older than days, returns the number removed"""
+
+    table = MeshTombstone.__table__
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+
+    expired = (table.c.deleted_on < cutoff) & (table.c.kind != TOMBSTONE_HORIZON)
+
+    horizon = connection.execute(
+        db.select(db.func.max(table.c.revision)).where(
+            expired | (table.c.kind == TOMBSTONE_HORIZON))
+        ).scalar()
+
+    removed = connection.execute(table.delete().where(expired)).rowcount
+
+    if removed:
+        connection.execute(table.delete().where(table.c.kind == TOMBSTONE_HORIZON))
+        connection.execute(table.insert().values(
+            kind=TOMBSTONE_HORIZON, row_id=0, revision=horizon))
+
+    return removed
+
 class MeshGroup(db.Model, Serializer):
     """Mesh group"""
     __tablename__ = 'mesh_group'
@@ -91,12 +236,33 @@ class MeshGroup(db.Model, Serializer):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String, unique=True)
     label = db.Column(db.String)
-    ssh_user = db.Column(db.String)
+    ssh_user = db.Column(db.String, index=True)
     ssh_host = db.Column(db.String)
     ssh_port = db.Column(db.Integer, default=22)
+    revision = revision_column()
 
 PortSeq = db.Sequence('port_seq', start=2200)
 
+def sshkey_fingerprint(sshkey):
+    """SHA256 fingerprint of a public key, as sshd reports it (%f)"""
+
+    try:
+        blob = base64.b64decode(sshkey.split()[1], validate=True)
+    except (AttributeError, IndexError, binascii.Error):
+        return None
+
+    digest = base64.b64encode(hashlib.sha256(blob).digest()).decode()
+
+    return 'SHA256:' + digest.rstrip('=')
+
+def normalize_fingerprint(fingerprint):
+    """Accept fingerprints with or without the SHA256: prefix"""
+
+    if not fingerprint.startswith('SHA256:'):
+        fingerprint = 'SHA256:' + fingerprint
+
+    return fingerprint.rstrip('=')
+
 class MeshTunnel(db.Model, Serializer):
     """Mesh tunnel"""
     __tablename__ = 'mesh_tunnel'
@@ -105,14 +271,13 @@ class MeshTunnel(db.Model, Serializer):
     name = db.Column(db.String, unique=True)
     description = db.Column(db.String)
 
-    def serialize(self):
-        d = Serializer.serialize(self)
-        del d["nodes"]
-        return d
-
 class MeshNode(db.Model, Serializer):
     """Mesh node"""
     __tablename__ = 'mesh_node'
+    serialize_exclude = ('sshkey', 'sshkey_fingerprint')
+    __table_args__ = (
+        db.Index('ix_mesh_node_group_id_active', 'group_id', 'active'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     group_id = db.Column(db.Integer, db.ForeignKey('mesh_group.id'))
@@ -121,6 +286,7 @@ class MeshNode(db.Model, Serializer):
     name = db.Column(db.String,default='')
     label = db.Column(db.String,default='')
     sshkey = db.Column(db.String,default='')
+    sshkey_fingerprint = db.Column(db.String, index=True)
 
     ssh_port = db.Column(db.Integer, PortSeq,
         server_default=PortSeq.next_value(),
@@ -148,13 +314,28 @@ class MeshNode(db.Model, Serializer):
     checked_on = db.Column(db.DateTime(timezone=True),
                     nullable=False, default=datetime.datetime.utcnow)
 
+    revision = revision_column()
+
     tunnel = db.relationship('MeshTunnel', backref='nodes')
 
-    def serialize(self):
-        d = Serializer.serialize(self)
-        del d["sshkey"]
-        del d["tunnel"]
-        return d
+    @validates('sshkey')
+    def validate_sshkey(self, key, sshkey):
+        # Keep the fingerprint index in sync with the key
+        self.sshkey_fingerprint = sshkey_fingerprint(sshkey)
+        return sshkey
+
+def add_tombstone(connection, kind, row_id):
+    connection.execute(MeshTombstone.__table__.insert().values(
+        kind=kind, row_id=row_id))
+    purge_tombstones(connection, current_app.config.get('MESH_TOMBSTONE_DAYS', 30))
+
+@event.listens_for(MeshGroup, 'after_delete')
+def tombstone_group(mapper, connection, target):
+    add_tombstone(connection, 'group', target.id)
+
+@event.listens_for(MeshNode, 'after_delete')
+def tombstone_node(mapper, connection, target):
+    add_tombstone(connection, 'node', target.id)
 
 #-------------------------------------------------------------------------
 # User management tables
@@ -178,6 +359,23 @@ class History(db.Model):
     def __repr__(self):
         return '[%s] <%s> %s' % (self.timestamp,self.username,self.action)
 
+class OutboundMail(db.Model):
+    """ Queue of messages waiting to be sent (see server/mailqueue.py)"""
+    __tablename__ = 'mail_queue'
+    __bind_key__ = 'users'
+
+    id = db.Column(db.Integer,primary_key=True,autoincrement=True)
+    created_on = db.Column(db.DateTime,nullable=False,default=datetime.datetime.utcnow)
+    send_after = db.Column(db.DateTime,nullable=False,default=datetime.datetime.utcnow,index=True)
+    attempts = db.Column(db.Integer,nullable=False,default=0)
+    sender = db.Column(db.String(255),nullable=False)
+    recipients = db.Column(db.Text,nullable=False)
+    message = db.Column(db.Text,nullable=False)
+    last_error = db.Column(db.Text)
+
+    def __repr__(self):
+        return '[%s] <%s> %s' % (self.created_on,self.sender,self.recipients)
+
 class User(db.Model):
     """ User Model for storing user related details"""
     __tablename__ = 'users'
@@ -271,28 +469,35 @@ class Role(db.Model):
     description = db.Column(db.String(255))
 
 class BlacklistToken(db.Model):
+    """ Revoked tokens, by JWT id (see server/revoked.py)"""
     __tablename__ = 'blacklist_tokens'
     __bind_key__ = 'users'
 
     id = db.Column(db.Integer,primary_key=True,autoincrement=True)
-    token = db.Column(db.String(500),unique=True,nullable=False)
+    jti = db.Column(db.String(36),unique=True,index=True)
+    token = db.Column(db.String(500),unique=True)
     blacklisted_on = db.Column(db.DateTime,nullable=False)
+    expires_on = db.Column(db.DateTime,index=True)
 
-    def __init__(self):
+    def __init__(self,jti=None,token=None,expires_on=None):
+        self.jti = jti
         self.token = token
-        self.blacklisted_on = datetime.datetime.now()
+        self.expires_on = expires_on
+        self.blacklisted_on = datetime.datetime.utcnow()
 
     def __repr__(self):
-        return '<id: token: {}'.format(self.token)
+        return '<id: token: {}'.format(self.jti or self.token)
+
+    @property
+    def key(self):
+        return self.jti or self.token
 
     @staticmethod
     def check_blacklist(auth_token):
-        res = BlacklistToken.query.filter_by(token=str(auth_token)).first()
-        if res:
-            return True
-        else:
-            return False
-
-
+        return revoked.is_revoked(str(auth_token))
 
+#-------------------------------------------------------------------------
+# Resolve the serializers now rather than on the first request
 
+for table in [Site, MeshGroup, MeshTunnel, MeshNode]:
+    table.serializer()
@@ -0,0 +1,87 @@
+##########################################################################
+#
+#   SQL template registry
+#
+#   The queries in routes/sql/*.sql are loaded once when the app starts
+#   and turned into SQLAlchemy text() statements. The {name} (or quoted
+#   '{name}') placeholders become bound parameters, so user input is
+#   never formatted into the SQL and the same statement object is reused
+#   for every request:
+#
+#       statement = queries.get('get_radar')
+#       engine.execute(statement, sitename=sitename, start_ts=start_ts)
+#
+#   In development mode the files are reloaded when they change.
+#
+##########################################################################
+
+from sqlalchemy import text
+
+import glob
+import logging
+import os
+import re
+import threading
+
+PLACEHOLDER = re.compile(r"'\{(\w+)\}'|\{(\w+)\}")
+
+def bind_placeholders(sql):
+    """Replace {name} and '{name}' with a :name bound parameter"""
+
+    # Parenthesized so a cast like {name}::integer still parses
+
+    return PLACEHOLDER.sub(lambda m: '(:%s)' % (m.group(1) or m.group(2)), sql)
+
+class QueryRegistry(object):
+
+    def __init__(self, app=None):
+        self.path = os.path.join(os.path.dirname(__file__), 'routes', 'sql')
+        self.reload = False
+        self.lock = threading.Lock()
+        self.statements = {}
+        self.mtimes = {}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.path = app.config.get('SQL_TEMPLATE_PATH', self.path)
+        self.reload = app.config.get('MODE') == 'development'
+
+        for filename in sorted(glob.glob(os.path.join(self.path, '*.sql'))):
+            name = os.path.splitext(os.path.basename(filename))[0]
+            self.load(name)
+
+        logging.info('Loaded %d SQL templates' % len(self.statements))
+
+        app.extensions['queries'] = self
+
+    def filename(self, name):
+        return os.path.join(self.path, name + '.sql')
+
+    def load(self, name):
+        filename = self.filename(name)
+        mtime = os.stat(filename).st_mtime_ns
+
+        with open(filename) as f:
+            statement = text(bind_placeholders(f.read()))
+
+        with self.lock:
+            self.statements[name] = statement
+            self.mtimes[name] = mtime
+
+        return statement
+
+    def get(self, name):
+
+        if self.reload:
+            try:
+                changed = os.stat(self.filename(name)).st_mtime_ns != self.mtimes.get(name)
+            except FileNotFoundError:
+                changed = False
+
+            if changed:
+                logging.info('Reloading SQL template %s' % name)
+                return self.load(name)
+
+        return self.statements[name]
@@ -0,0 +1,137 @@
+##########################################################################
+#
+#   Revoked token set
+#
+#   flask-jwt-extended calls the blocklist loader for every protected
+#   request. Rather than query blacklist_tokens each time, the ids (jti)
+#   of the revoked tokens that have not yet expired are kept in memory:
+#
+#       - loaded in full on first use and again every REVOKED_REFRESH
+#         seconds, so a token revoked by another worker is refused
+#         within that time (at once in the same process)
+#       - rows for tokens past their expiry are deleted every
+#         REVOKED_PURGE_INTERVAL seconds, they would fail the exp
+#         check anyway
+#
+#   The whole table is read each time rather than only the rows after
+#   the last id seen. Ids are handed out before the commit, so a row
+#   with a lower id can become visible after a higher one and would
+#   be missed. Once purged the table only holds unexpired tokens.
+#
+#   Old rows written before tokens were tracked by jti are matched on
+#   the full token string instead.
+#
+##########################################################################
+
+import calendar
+import datetime
+import logging
+import threading
+import time
+
+class RevokedTokens(object):
+
+    def __init__(self, app=None):
+        self.refresh_interval = 30
+        self.purge_interval = 3600
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.local = {}
+        self.refreshed = None
+        self.purged = time.monotonic()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.refresh_interval = app.config.get('REVOKED_REFRESH', self.refresh_interval)
+        self.purge_interval = app.config.get('REVOKED_PURGE_INTERVAL', self.purge_interval)
+
+        app.extensions['flask-jwt-extended'].token_in_blocklist_loader(self.check)
+        app.extensions['revoked'] = self
+
+    #-- Lookups -----------------------------------------------------------
+
+    def check(self, jwt_header, jwt_payload):
+        return self.is_revoked(jwt_payload['jti'])
+
+    def is_revoked(self, key):
+        now = time.monotonic()
+
+        if self.refreshed is None or now - self.refreshed >= self.refresh_interval:
+            self.try_refresh()
+
+        return key in self.entries
+
+    #-- Updates -----------------------------------------------------------
+
+    def revoke(self, jti, exp):
+        """Revoke the token with id jti that expires at exp (epoch)"""
+
+        from .model import db, BlacklistToken
+
+        expires_on = datetime.datetime.utcfromtimestamp(exp)
+
+        db.session.add(BlacklistToken(jti=jti, expires_on=expires_on))
+        db.session.commit()
+
+        with self.lock:
+            self.entries[jti] = exp
+            self.local[jti] = (exp, time.monotonic())
+
+    def try_refresh(self):
+        try:
+            self.refresh()
+        except Exception:
+            logging.exception('Failed to refresh revoked tokens')
+
+    def refresh(self):
+        from .model import BlacklistToken
+
+        started = time.monotonic()
+        entries = {}
+
+        for row in BlacklistToken.query.all():
+            if row.expires_on is None:
+                exp = None
+            else:
+                exp = calendar.timegm(row.expires_on.timetuple())
+            entries[row.key] = exp
+
+        with self.lock:
+
+            # Keep tokens revoked here while the query ran, it may not
+            # have seen them
+
+            self.local = {jti: (exp, revoked_at)
+                            for jti, (exp, revoked_at) in self.local.items()
+                            if revoked_at >= started}
+
+            for jti, (exp, revoked_at) in self.local.items():
+                entries[jti] = exp
+
+            self.entries = entries
+            self.refreshed = time.monotonic()
+
+        if time.monotonic() - self.purged >= self.purge_interval:
+            self.purge()
+
+    def purge(self):
+        """Forget tokens that are past their expiry"""
+
+        from .model import db, BlacklistToken
+
+        now = time.time()
+
+        deleted = BlacklistToken.query.filter(
+                    BlacklistToken.expires_on < datetime.datetime.utcfromtimestamp(now)
+                    ).delete(synchronize_session=False)
+        db.session.commit()
+
+        with self.lock:
+            self.entries = {key: exp for key, exp in self.entries.items()
+                                if exp is None or exp >= now}
+            self.purged = time.monotonic()
+
+        if deleted:
+            logging.info('Purged %d expired revoked tokens' % deleted)
@@ -0,0 +1,39 @@
+##########################################################################
+#
+#   Per-process cache of user roles
+#
+#   The role name is signed into the access token at login and refresh
+#   (the "role" claim), and admin_required checks it against this cache
+#   so a demoted or disabled user loses access right away without a
+#   database query on every call. Entries are dropped when the role or
+#   active flag changes, through the API or the CLI (see ConfigCache).
+#
+##########################################################################
+
+from .checkin import ConfigCache
+
+class RoleCache(ConfigCache):
+
+    stampname = 'roles.stamp'
+    extension = 'roles'
+
+    def resolve(self, username, cached=True):
+        """Role name for an active user, otherwise None"""
+
+        role = self.get(username) if cached else None
+
+        if role is None:
+            role = self.load(username)
+            self.set(username, role)
+
+        return role or None
+
+    def load(self, username):
+        from .model import User
+
+        user = User.query.filter_by(username=username).first()
+
+        if not user or not user.active or not user.role:
+            return ''
+
+        return user.role.name
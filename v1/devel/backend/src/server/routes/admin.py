@@ -1,15 +1,14 @@
 from flask import Blueprint, jsonify, request, current_app
-from flask_jwt_extended import jwt_required, verify_jwt_in_request, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask_restful import Api, Resource, reqparse, fields, marshal_with
 from sqlalchemy import inspect, desc
 
-from server import model
+from server import model, mailqueue, roles
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from functools import wraps
 
-import smtplib
 from . import history
+from .util import admin_required
 
 bp = Blueprint('admin',__name__,url_prefix='/admin')
 api = Api(bp)
@@ -20,19 +19,6 @@ def object_as_dict(obj):
                 for c in inspect(obj).mapper.column_attrs}
 
 
-def admin_required(fn):
-    @wraps(fn)
-    def wrapper(*args,**kwargs):
-        verify_jwt_in_request()
-        username = get_jwt_identity()
-        user = model.User.query.filter_by(username=username).first()
-
-        if not user or not user.admin:
-            return jsonify({ 'message': 'Unauthorized' }),401
-
-        return fn(*args,**kwargs)
-    return wrapper
-
 user_fields = {
     'id': fields.Integer,
     'username': fields.String,
@@ -100,9 +86,7 @@ def SendSignupApprovedEmail(user):
 
     message.attach(MIMEText(body,"plain"))
 
-    smtp = smtplib.SMTP('localhost')
-    smtp.sendmail(sender_email,receiver_email,message.as_string())
-    smtp.quit()
+    mailqueue.enqueue(message,sender_email,[receiver_email])
 
 def SendSignupDeniedEmail(user):
 
@@ -129,9 +113,7 @@ def SendSignupDeniedEmail(user):
 
     message.attach(MIMEText(body,"plain"))
 
-    smtp = smtplib.SMTP('localhost')
-    smtp.sendmail(sender_email,receiver_email,message.as_string())
-    smtp.quit()
+    mailqueue.enqueue(message,sender_email,[receiver_email])
 
     get_jwt_identity()
 
@@ -154,12 +136,15 @@ class ApproveUser(Resource):
         user.pending=False
         user.active=True
 
+        SendSignupApprovedEmail(user)
+
         try:
             model.db.session.commit()
         except:
             model.db.session.rollback()
 
-        SendSignupApprovedEmail(user)
+        roles.invalidate(username)
+
         history.add_entry(get_jwt_identity(),'Approved %s' % username)
 
         return {'message':'approved'},200
@@ -183,12 +168,15 @@ class DenyUser(Resource):
         user.pending=False
         user.active=False
 
+        SendSignupDeniedEmail(user)
+
         try:
             model.db.session.commit()
         except:
             model.db.session.rollback()
 
-        SendSignupDeniedEmail(user)
+        roles.invalidate(username)
+
         history.add_entry(get_jwt_identity(),'Denied %s' % username)
 
         return {'message':'denied'},200
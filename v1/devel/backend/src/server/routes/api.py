@@ -1,7 +1,7 @@
 from flask import Blueprint, jsonify, request, redirect, current_app, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
-from server import pages, model, db
+from server import pages, model, db, tiles, queries, sites
 from . import util
 
 import datetime
@@ -10,6 +10,64 @@ import base64
 
 bp = Blueprint('api',__name__,url_prefix='/api')
 
+# Column types for the packed format, in the order of the SQL select
+
+RADAR_COLUMNS = [
+    ('timestamp',   'int64'),
+    ('r',           'float32'),
+    ('az',          'float32'),
+    ('el',          'float32'),
+    ('lower',       'float32')
+]
+
+TRACK_COLUMNS = [
+    ('id',          'int64'),
+    ('timestamp',   'float64'),
+    ('track_id',    'int64'),
+    ('target_id',   'int64'),
+    ('x',           'float32'),
+    ('y',           'float32'),
+    ('z',           'float32'),
+    ('xdot',        'float32'),
+    ('ydot',        'float32'),
+    ('zdot',        'float32')
+]
+
+def resolve_site(sitename):
+
+    site_id = sites.resolve(sitename)
+
+    if site_id is None:
+        abort(404,description='Unknown site: %s' % sitename)
+
+    return site_id
+
+def time_range(data):
+
+    try:
+        return float(data['start_ts']), float(data['stop_ts'])
+    except (KeyError, TypeError, ValueError):
+        abort(400,description='start_ts and stop_ts must be numbers')
+
+def downsample_buckets(data, start_ts, stop_ts):
+    # Number of time buckets for max_points, two points are kept per bucket
+
+    if data.get('max_points') is None:
+        return None
+
+    try:
+        max_points = int(data['max_points'])
+    except (TypeError, ValueError):
+        abort(400,description='max_points must be an integer')
+
+    if max_points < 2:
+        abort(400,description='max_points must be at least 2')
+
+    if stop_ts <= start_ts:
+        return None
+
+    return max_points//2
+
 @bp.route('/echo')
 def api_echo():
     return jsonify(dict(
@@ -23,59 +81,64 @@ def get_page(path):
 
 @bp.route('/sites')
 def get_sites():
-    sites = [util.convert(row) for row in model.Site.query.all()]
-    return jsonify(sites=sites)
+    return jsonify(sites=sites.all())
 
 @bp.route('/site/<path:sitename>/truth')
 def get_truth(sitename):
     
     engine = db.session.get_bind()
+    site_id = resolve_site(sitename)
 
-    sql = open('server/routes/sql/get_truth.sql').read()
-    sql = sql.format(sitename=sitename)
-    data = engine.execute(sql).first()[0]
+    sql = queries.get('get_truth')
+    data = engine.execute(sql,site_id=site_id).first()[0]
 
-    sql = open('server/routes/sql/get_truth_flights.sql').read()
-    sql = sql.format(sitename=sitename)
-    flights = engine.execute(sql).first()[0]
+    sql = queries.get('get_truth_flights')
+    flights = engine.execute(sql,site_id=site_id).first()[0]
 
     return jsonify(truth=data,flights=flights)
 
-@bp.route('/site/<path:sitename>/radar',methods=['POST'])
-def get_radar(sitename):
+def stream_data(dataset, sitename, data, columns, limit=None):
 
-    data = request.get_json()
+    engine = db.session.get_bind()
+    size = current_app.config['STREAM_CHUNK_SIZE']
+    site_id = resolve_site(sitename)
+    start_ts, stop_ts = time_range(data)
+    buckets = downsample_buckets(data, start_ts, stop_ts)
 
-    args = {
-        'sitename': sitename,
-        'start_ts': data['start_ts'],
-        'stop_ts':  data['stop_ts'] 
-    }
+    if buckets:
+        sql = queries.get('get_%s_downsampled' % dataset)
+        params = dict(
+                site_id=site_id,
+                start_ts=start_ts,
+                stop_ts=stop_ts,
+                buckets=buckets
+                )
+        return util.stream_query(engine,sql,params,'radar',columns)
 
-    engine = db.session.get_bind()
-    sql = open('server/routes/sql/get_radar.sql').read()
-    sql = sql.format(**args)
-    results = engine.execute(sql).first()[0]
+    # Full resolution data is assembled from cached time tiles
 
-    return jsonify(radar=results)
+    sql = queries.get('get_%s' % dataset)
 
-@bp.route('/site/<path:sitename>/tracks',methods=['POST'])
-def get_tracks(sitename):
+    def fetch(start_ts, stop_ts):
+        params = dict(site_id=site_id,start_ts=start_ts,stop_ts=stop_ts)
+        return util.query_chunks(engine,sql,params,size)
 
-    data = request.get_json()
+    chunks = tiles.chunks(dataset, sitename, start_ts, stop_ts,
+                columns, fetch, limit=limit, size=size)
 
-    args = {
-        'sitename': sitename,
-        'start_ts': data['start_ts'],
-        'stop_ts':  data['stop_ts'] 
-    }
+    return util.stream_chunks(chunks,'radar',columns)
 
-    engine = db.session.get_bind()
-    sql = open('server/routes/sql/get_tracks.sql').read()
-    sql = sql.format(**args)
-    results = engine.execute(sql).first()[0]
+@bp.route('/site/<path:sitename>/radar',methods=['POST'])
+def get_radar(sitename):
+
+    data = request.get_json()
 
-    return jsonify(radar=results)
+    return stream_data('radar',sitename,data,RADAR_COLUMNS,limit=1000000)
 
+@bp.route('/site/<path:sitename>/tracks',methods=['POST'])
+def get_tracks(sitename):
+
+    data = request.get_json()
 
+    return stream_data('tracks',sitename,data,TRACK_COLUMNS)
 
@@ -5,12 +5,12 @@ from flask import (
 from flask_jwt_extended import (
     decode_token,
     create_access_token, create_refresh_token,
-    get_jwt_identity, jwt_required
+    get_jwt_identity, get_jwt, jwt_required
     )
 from flask_restful import Api, Resource, reqparse, abort
 from flask_mail import Message
 
-from server import model, mail
+from server import model, mailqueue, roles, revoked
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
@@ -28,7 +28,7 @@ def send_email(email,subject,text,html):
     msg.body = text
     msg.html = html
 
-    mail.send(msg)
+    mailqueue.enqueue(msg)
 
 
 def abort_if_user_exists(username):
@@ -107,7 +107,10 @@ class user_login(Resource):
         user = model.User.query.filter_by(username=username).first()
 
         if user and user.check_password(data['password']) and user.active:
-            access_token = create_access_token(identity=username,fresh=True)
+            role = roles.resolve(username,cached=False)
+            claims = {'role': role}
+            access_token = create_access_token(identity=username,fresh=True,
+                                additional_claims=claims)
             refresh_token = create_refresh_token(username)
             return {
                 'access_token': access_token,
@@ -121,9 +124,28 @@ class token_refresh(Resource):
     @jwt_required(refresh=True)
     def post(self):
         current_user = get_jwt_identity()
-        new_token = create_access_token(identity=current_user, fresh=False)
+
+        # Pick up any role change made since the last token
+
+        role = roles.resolve(current_user,cached=False)
+
+        if role is None:
+            return {'message':'Invalid credentials'},401
+
+        claims = {'role': role}
+        new_token = create_access_token(identity=current_user, fresh=False,
+                        additional_claims=claims)
         return { 'access_token': new_token},200
 
+class user_logout(Resource):
+
+    # Called with the access token and again with the refresh token
+
+    @jwt_required(verify_type=False)
+    def post(self):
+        token = get_jwt()
+        revoked.revoke(token['jti'],token['exp'])
+        return {'message':'Token revoked'},200
 
 #-- Create Account -------------------------------------------------
 
@@ -145,10 +167,11 @@ class create_account(Resource):
 
         user = model.User(**data)
         model.db.session.add(user)
-        model.db.session.commit()
 
         send_creation_notify(user)
         send_activation_email(user)
+        model.db.session.commit()
+
         history.add_entry('system','Account created for %s' % username)
 
         return { 'message': 'Request submitted' },200
@@ -168,9 +191,10 @@ class activate_account(Resource):
         user.active = True
 
         model.db.session.add(user)
-        model.db.session.commit()
 
         send_welcome_email(user)
+        model.db.session.commit()
+
         history.add_entry('system','Account activated for %s' % user.username)
 
         return redirect(url_for('main.index'))
@@ -189,6 +213,8 @@ class forgot_password(Resource):
         user = model.User.query.filter_by(username=username).first_or_404()
 
         send_password_email(user)
+        model.db.session.commit()
+
         history.add_entry('system','Password reset request for %s' % username)
 
         return { 'message': 'Request submitted' },200
@@ -238,6 +264,8 @@ class forgot_username(Resource):
         user = model.User.query.filter_by(email=email).first_or_404()
 
         send_username_email(user)
+        model.db.session.commit()
+
         history.add_entry('system','Username lookup request for %s' % user.username)
 
         return { 'message': 'Request submitted' },200
@@ -259,6 +287,7 @@ class user_profile(Resource):
 
 api.add_resource(user_login,'/login')
 api.add_resource(token_refresh,'/refresh')
+api.add_resource(user_logout,'/logout')
 api.add_resource(user_profile,'/profile')
 api.add_resource(create_account,'/signup')
 api.add_resource(activate_account,'/activate/<string:token>')
@@ -1,14 +1,6 @@
-from server import model
-from flask import current_app
+from server import audit
 
 def add_entry(username,action):
-    entry = model.History(username,action)
-    model.db.session.add(entry)
-
-    try:
-        model.db.session.commit()
-        current_app.logger.info('adding history entry')
-    except:
-        model.db.session.rollback()
-        current_app.logger.error('Error adding history entry')
+    # Written out in batches by the audit log
+    audit.record(username,action)
 
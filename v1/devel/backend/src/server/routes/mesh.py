@@ -7,7 +7,7 @@ from flask_jwt_extended import (
     create_access_token, create_refresh_token,
     get_jwt_identity, jwt_required
     )
-from flask_restful import Api, Resource, reqparse, abort, fields, marshal_with
+from flask_restful import Api, Resource, reqparse, abort, fields, marshal_with, inputs
 from flask_mail import Message
 
 from server import model, mail
@@ -22,11 +22,13 @@ import json
 import os
 import shutil
 import click
+import sqlalchemy
 import shutil
 import hashlib
+import base64
 
 from . import history
-from server import db, model
+from server import db, model, checkins, configs, schedule
 
 bp = Blueprint('mesh',__name__,url_prefix='/mesh',template_folder='templates')
 api = Api(bp)
@@ -82,20 +84,33 @@ def list_nodes():
     click.echo(fmt % ('ID','Group','Name','UUID','Checked on (UTC)'))
     click.echo('-'*75)
 
-    for node in model.MeshNode.query.order_by(model.MeshNode.id).all():
-        group = cli_lookup_group_id(id=node.group_id)
-        checked_on = node.checked_on.strftime(timefmt) 
-        click.echo(fmt % (node.id,group.name,node.name,node.uuid,checked_on))
+    nodes = db.session.query(
+            model.MeshNode,
+            model.MeshGroup.name
+        ).outerjoin(
+            model.MeshGroup, model.MeshGroup.id==model.MeshNode.group_id
+        ).order_by(model.MeshNode.id)
+
+    for node, group_name in nodes:
+        checked_on = checkins.checked_on(node.uuid, node.checked_on)
+        checked_on = checked_on.strftime(timefmt) 
+        click.echo(fmt % (node.id,group_name,node.name,node.uuid,checked_on))
 
     click.echo()
 
 @bp.cli.command('list-sshkeys')
 @click.argument('name',metavar='Username or group name')
+@click.argument('keytype',required=False)
+@click.argument('fingerprint',required=False)
 @click.option('--summary/--no-summary',help='Summary only',default=False)
 @click.option('--group/--username',help='Lookup by group or username',default=False)
-def list_sshkeys(name, summary, group):
+def list_sshkeys(name, keytype, fingerprint, summary, group):
+
+    # Called from sshd as: AuthorizedKeysCommand ... %u %t %f
    
-    if group:
+    if fingerprint:
+        sshkeys = get_sshkeys_by_fingerprint(name, keytype, fingerprint)
+    elif group:
         sshkeys = get_sshkeys_by_group(name)
     else:
         sshkeys = get_sshkeys_by_username(name)
@@ -110,6 +125,17 @@ def list_sshkeys(name, summary, group):
         for public_key in sshkeys:
             print(public_key)
 
+@bp.cli.command('keylookup-server')
+@click.option('-s','--socket','path',help='Unix socket path')
+def keylookup_server(path):
+
+    from server import keylookup
+
+    path = path or current_app.config['KEYLOOKUP_SOCKET']
+    refresh = current_app.config['KEYLOOKUP_REFRESH']
+
+    keylookup.serve(current_app._get_current_object(), path, refresh=refresh)
+
 @bp.cli.command('add-group')
 @click.argument('group_name')
 @click.option('-u','--username',default='',show_default=True)
@@ -148,6 +174,7 @@ def del_group(group_name):
 
     db.session.delete(group)
     db.session.commit()
+    configs.invalidate()
 
     click.echo(f'Deleted group {group_name}')
 
@@ -184,6 +211,7 @@ def mod_group(group_name,username,ssh_host,ssh_port,label):
         group.ssh_port = ssh_port
 
     db.session.commit()
+    configs.invalidate()
 
 @bp.cli.command('show-group')
 @click.argument('group_name')
@@ -250,6 +278,7 @@ def del_node(uuid):
 
     db.session.delete(node)
     db.session.commit()
+    configs.invalidate(uuid)
 
     click.echo(f'Deleted node {uuid}')
 
@@ -332,8 +361,10 @@ def mod_node(uuid,active,pending,update,name,group_name,longitude,latitude,repla
             db.session.commit()
 
         node.uuid = replace_uuid
+        configs.invalidate(replace_uuid)
 
     db.session.commit()
+    configs.invalidate(uuid)
 
 @bp.cli.command('show-node')
 @click.argument('uuid')
@@ -361,9 +392,21 @@ def show_node(uuid):
     click.echo(f'Update:      {node.update}')
     click.echo(f'Created on:  {node.created_on}')
     click.echo(f'Updated on:  {node.updated_on}')
-    click.echo(f'Checked on:  {node.checked_on}')
+    click.echo(f'Checked on:  {checkins.checked_on(uuid, node.checked_on)}')
     click.echo()
 
+@bp.cli.command('purge-tombstones')
+@click.option('--days',type=int,help='Keep tombstones this many days')
+def purge_tombstones(days):
+
+    if days is None:
+        days = current_app.config.get('MESH_TOMBSTONE_DAYS', 30)
+
+    with db.engine.begin() as conn:
+        removed = model.purge_tombstones(conn, days)
+
+    click.echo(f'Purged {removed} tombstones')
+
 #-- Helper Functions -------------------------------------------------
 
 def send_email(email,subject,text,html):
@@ -396,24 +439,134 @@ def lookup_tunnel(name):
 def lookup_node(uuid):
     return model.MeshNode.query.filter_by(uuid=uuid).first_or_404()
 
+def current_actor():
+    # Username for the history log, not every write path requires a login
+
+    try:
+        return get_jwt_identity() or 'system'
+    except RuntimeError:
+        return 'system'
+
+def resolve_checkin_config(uuid):
+    """Checkin response and its ETag for node uuid, cached until invalidated"""
+
+    entry = configs.get(uuid)
+
+    if entry is not None:
+        return entry
+
+    row = db.session.query(
+            model.MeshNode.pending,
+            model.MeshNode.active,
+            model.MeshNode.update,
+            model.MeshNode.name,
+            model.MeshNode.sshkey,
+            model.MeshNode.ssh_port,
+            model.MeshNode.ssh_port_alt,
+            model.MeshNode.latitude,
+            model.MeshNode.longitude,
+            model.MeshGroup.ssh_host,
+            model.MeshGroup.ssh_port.label('ssh_host_port'),
+            model.MeshGroup.ssh_user,
+            model.MeshTunnel.name.label('tunnel')
+        ).join(
+            model.MeshGroup, model.MeshGroup.id==model.MeshNode.group_id
+        ).outerjoin(
+            model.MeshTunnel, model.MeshTunnel.id==model.MeshNode.tunnel_id
+        ).filter(
+            model.MeshNode.uuid==uuid
+        ).first()
+
+    if row is None:
+        abort(404)
+
+    config = {
+        'pending':      row.pending
+    }
+
+    if not row.pending:
+
+        config.update({
+            'active':           row.active,
+            'update':           row.update,
+            'name':             row.name,
+            'ssh_port':         row.ssh_port,
+            'ssh_port_alt':     row.ssh_port_alt,
+            'ssh_host':         row.ssh_host,
+            'ssh_host_port':    row.ssh_host_port,
+            'ssh_user':         row.ssh_user,
+            'tunnel':           row.tunnel
+        })
+
+        if row.sshkey: 
+            key_md5 = hashlib.md5(row.sshkey.encode()).hexdigest()
+            config.update({
+                'sshkey_md5':   key_md5
+            })
+
+        if row.latitude and row.longitude:
+            config.update({
+                'latitude':     row.latitude,
+                'longitude':    row.longitude
+            })
+
+    payload = json.dumps(config, sort_keys=True)
+    etag = '"%s"' % hashlib.md5(payload.encode()).hexdigest()
+
+    entry = config, etag
+    configs.set(uuid, entry)
+
+    return entry
+
+def query_active_sshkeys():
+    return db.session.query(
+            model.MeshNode.sshkey
+        ).join(
+            model.MeshGroup, model.MeshGroup.id==model.MeshNode.group_id
+        ).filter(
+            model.MeshNode.active==True
+        ).order_by(model.MeshNode.id)
+
 def get_sshkeys_by_group(group_name):
 
-    group = lookup_group(group_name)
-    nodes = model.MeshNode.query.filter_by(group_id=group.id,active=True).all()
+    # Outer join so an unknown group (no rows, 404) can be told apart
+    # from a group without any active keys in the same query
 
-    return [node.sshkey for node in nodes if node.sshkey]
+    rows = db.session.query(
+            model.MeshGroup.id, model.MeshNode.sshkey
+        ).outerjoin(
+            model.MeshNode, sqlalchemy.and_(
+                model.MeshNode.group_id==model.MeshGroup.id,
+                model.MeshNode.active==True)
+        ).filter(
+            model.MeshGroup.name==group_name
+        ).order_by(model.MeshNode.id).all()
 
-def get_sshkeys_by_username(username):
+    if not rows:
+        abort(404)
+
+    return [sshkey for group_id, sshkey in rows if sshkey]
 
-    groups = model.MeshGroup.query.filter_by(ssh_user=username).all()
+def get_sshkeys_by_fingerprint(username, keytype, fingerprint):
 
-    keys = []
+    fingerprint = model.normalize_fingerprint(fingerprint)
+
+    nodes = model.MeshNode.query.join(
+            model.MeshGroup, model.MeshGroup.id==model.MeshNode.group_id
+        ).filter(
+            model.MeshGroup.ssh_user==username,
+            model.MeshNode.sshkey_fingerprint==fingerprint,
+            model.MeshNode.active==True
+        ).all()
+
+    return [node.sshkey for node in nodes 
+            if node.sshkey and node.sshkey.split()[0]==keytype]
+
+def get_sshkeys_by_username(username):
 
-    for group in groups:
-        nodes = model.MeshNode.query.filter_by(group_id=group.id,active=True).all()
-        keys += [node.sshkey for node in nodes if node.sshkey]
+    rows = query_active_sshkeys().filter(model.MeshGroup.ssh_user==username)
 
-    return keys
+    return [sshkey for sshkey, in rows if sshkey]
 
 #-- Email Handlers -------------------------------------------------
 
@@ -643,6 +796,8 @@ class GroupList(Resource):
         model.db.session.add(group)
         model.db.session.commit()
 
+        history.add_entry(current_actor(),'Added group %s' % name)
+
         return group.id, 201
 
 class Group(Resource):
@@ -655,6 +810,9 @@ class Group(Resource):
         group = lookup_group(group_name)
         model.db.session.delete(group)
         model.db.session.commit()
+        configs.invalidate()
+
+        history.add_entry(current_actor(),'Deleted group %s' % group_name)
 
         return '', 204
        
@@ -668,6 +826,10 @@ class Group(Resource):
         except:
             abort(404, message=f'Failed to update group {group_name}')
 
+        configs.invalidate()
+
+        history.add_entry(current_actor(),'Updated group %s' % group_name)
+
         return self.get(group_name)
 
 #-- Tunnel Type Info --------------------------------------------
@@ -716,22 +878,197 @@ class Tunnel(Resource):
         except:
             abort(404, message=f'Failed to update tunnel {tunnel_name}')
 
+        configs.invalidate()
+
         return self.get(tunnel_name)
 
+#-- SSH Key Lookup --------------------------------------------
+
+class SSHKeyList(Resource):
+
+    parser = reqparse.RequestParser()
+    parser.add_argument('keytype',type=str,location='args')
+    parser.add_argument('fingerprint',type=str,location='args')
+
+    @apikey_required
+    def get(self, username):
+        args = self.parser.parse_args()
+
+        if args['keytype'] and args['fingerprint']:
+            keytype, fingerprint = args['keytype'], args['fingerprint']
+            return get_sshkeys_by_fingerprint(username, keytype, fingerprint)
+
+        return get_sshkeys_by_username(username)
+
 #-- Node Info -------------------------------------------------
 
+# Columns that can be returned or sorted on by the node list
+
+node_columns = model.MeshNode.serialize_columns()
+
+def merge_checkin(node):
+    """Use the buffered checkin time for a serialized node if newer"""
+
+    checked_on = checkins.checked_on(node['uuid'])
+
+    if checked_on is not None:
+        node['checked_on'] = model.epoch(checked_on)
+
+    return node
+
+def encode_cursor(value, id):
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    payload = json.dumps([value, id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def decode_cursor(cursor, column):
+    try:
+        value, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        abort(400, message='Invalid cursor')
+
+    if value is not None and isinstance(column.type, db.DateTime):
+        value = datetime.datetime.fromisoformat(value)
+
+    return value, id
+
+def keyset_after(column, id_column, value, id, descending):
+    """Rows after (value, id) when sorted on column, NULLs last"""
+
+    next_id = id_column < id if descending else id_column > id
+
+    if value is None:
+        return sqlalchemy.and_(column.is_(None), next_id)
+
+    beyond = column < value if descending else column > value
+
+    return sqlalchemy.or_(
+        beyond,
+        sqlalchemy.and_(column == value, next_id),
+        column.is_(None)
+        )
+
+def query_nodes(args):
+    """Filtered, sorted page of nodes as plain dicts (no ORM objects)"""
+
+    Node = model.MeshNode
+
+    fields = node_columns
+
+    if args['fields']:
+        fields = [f for f in args['fields'].split(',') if f in node_columns]
+        if not fields:
+            abort(400, message='No valid fields requested')
+
+    # Always fetch the keys needed for the cursor and checkin merge
+
+    sort = args['sort'] or 'id'
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+
+    if sort not in node_columns:
+        abort(400, message=f'Cannot sort on {sort}')
+
+    extra = [f for f in dict.fromkeys(['id', 'uuid', sort]) if f not in fields]
+    columns = [Node.__table__.c[f] for f in fields + extra]
+    sort_column = Node.__table__.c[sort]
+
+    query = db.session.query(*columns)
+
+    if args['group']:
+        query = query.join(model.MeshGroup, model.MeshGroup.id==Node.group_id)
+        query = query.filter(model.MeshGroup.name==args['group'])
+
+    if args['tunnel']:
+        query = query.join(model.MeshTunnel, model.MeshTunnel.id==Node.tunnel_id)
+        query = query.filter(model.MeshTunnel.name==args['tunnel'])
+
+    if args['active'] is not None:
+        query = query.filter(Node.active==args['active'])
+
+    if args['pending'] is not None:
+        query = query.filter(Node.pending==args['pending'])
+
+    if args['stale'] is not None:
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=args['stale'])
+        query = query.filter(Node.checked_on < cutoff)
+
+    if args['prefix']:
+        prefix = args['prefix'].replace('%', r'\%').replace('_', r'\_')
+        query = query.filter(Node.name.like(prefix + '%'))
+
+    # Keyset pagination on (sort column, id). Name, label and location
+    # can be NULL, which never compares true, so NULLs are sorted last
+    # in both directions and matched explicitly.
+
+    if args['after']:
+        value, id = decode_cursor(args['after'], sort_column)
+        query = query.filter(keyset_after(sort_column, Node.id, value, id, descending))
+
+    if descending:
+        query = query.order_by(sort_column.desc().nullslast(), Node.id.desc())
+    else:
+        query = query.order_by(sort_column.asc().nullslast(), Node.id)
+
+    limit = args['limit']
+
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    rows = query.all()
+
+    cursor = None
+
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]._asdict()
+        cursor = encode_cursor(last[sort], last['id'])
+
+    rows = Node.serialize_rows(rows, fields + extra)
+
+    for row in rows:
+        if 'checked_on' in fields:
+            merge_checkin(row)
+
+        for key in extra:
+            del row[key]
+
+    return rows, cursor
+
 class NodeList(Resource):
 
-    #parser = reqparse.RequestParser()
-    #parser.add_argument('uuid',type=str,required=True)
-    #parser.add_argument('sshkey',type=str,required=True)
-    #parser.add_argument('group',type=str,required=True)
+    parser = reqparse.RequestParser()
+    parser.add_argument('limit',type=inputs.int_range(1,5000),location='args')
+    parser.add_argument('after',type=str,location='args')
+    parser.add_argument('sort',type=str,location='args')
+    parser.add_argument('fields',type=str,location='args')
+    parser.add_argument('group',type=str,location='args')
+    parser.add_argument('tunnel',type=str,location='args')
+    parser.add_argument('active',type=inputs.boolean,location='args')
+    parser.add_argument('pending',type=inputs.boolean,location='args')
+    parser.add_argument('stale',type=inputs.natural,location='args')
+    parser.add_argument('prefix',type=str,location='args')
 
     # List nodes
+    #
+    #   ?limit=N&after=CURSOR   - keyset pagination, the cursor for the 
+    #                             next page is in the X-Next-Cursor header
+    #   ?sort=[-]column         - sort order (default id), NULLs last
+    #   ?fields=a,b,c           - only return these columns
+    #   ?group= ?tunnel= ?active= ?pending= ?prefix=
+    #   ?stale=SECONDS          - not checked in for this long
 
     def get(self): 
-        nodes = model.MeshNode.query.order_by(model.MeshNode.id).all()
-        return json.loads(json.dumps(model.MeshNode.serialize_list(nodes),default=str))
+        args = self.parser.parse_args()
+        rows, cursor = query_nodes(args)
+
+        headers = {}
+
+        if cursor:
+            headers['X-Next-Cursor'] = cursor
+
+        return rows, 200, headers
 
     # Register a new node
 
@@ -760,6 +1097,7 @@ class NodeList(Resource):
             if node.pending:
                 data['updated_on'] = datetime.datetime.utcnow()
                 model.update(node,data)
+                configs.invalidate(node.uuid)
             else:
                 abort(409, message='A node with that name is already registered')
         else:
@@ -780,12 +1118,14 @@ class Node(Resource):
 
     def get(self, uuid):
         node = lookup_node(uuid)
-        return json.loads(json.dumps(node.serialize(),default=str))
+        return merge_checkin(node.serialize())
 
     def delete(self, uuid):
         node = lookup_node(uuid)
         model.db.session.delete(node)
         model.db.session.commit()
+        configs.invalidate(uuid)
+        history.add_entry(current_actor(),'Deleted node %s' % uuid)
         return '', 204
        
     def patch(self, uuid):
@@ -813,6 +1153,10 @@ class Node(Resource):
             model.db.session.rollback()
             abort(404, message=f'Failed to update node')
 
+        configs.invalidate(uuid)
+
+        history.add_entry(current_actor(),'Updated node %s' % uuid)
+
         return self.get(uuid)
 
 class NodeCheckin(Resource):
@@ -821,51 +1165,66 @@ class NodeCheckin(Resource):
 
     @apikey_required
     def post(self, uuid):
-        #args = self.parser.parse_args()
-        args = {} 
-        node = lookup_node(uuid)
-        group = lookup_group_id(node.group_id)
-        args['checked_on'] = datetime.datetime.utcnow()
-        model.update(node,args)
+        results, etag = resolve_checkin_config(uuid)
 
-        try:
-            model.db.session.commit()
-        except:
-            current_app.logger.error('SQL ERROR')
-            db.session.rollback()
-            raise
+        # Written out in batches by the checkin buffer
 
-        results = {
-            'pending':      node.pending
-        }
+        checkins.record(uuid)
+        schedule.record()
 
-        if not node.pending:
-
-            results.update({
-                'active':           node.active,
-                'update':           node.update,
-                'name':             node.name,
-                'ssh_port':         node.ssh_port,
-                'ssh_port_alt':     node.ssh_port_alt,
-                'ssh_host':         group.ssh_host,
-                'ssh_host_port':    group.ssh_port,
-                'ssh_user':         group.ssh_user,
-                'tunnel':           node.tunnel.name
-            })
+        # Tell the node when to check in next (see schedule.py). This
+        # goes in the headers so it is sent with a 304 as well.
+
+        headers = schedule.headers(results)
+        headers['ETag'] = etag
 
-            if node.sshkey: 
-                key_md5 = hashlib.md5(node.sshkey.encode()).hexdigest()
-                results.update({
-                    'sshkey_md5':   key_md5
-                })
+        # Most nodes never change, send an empty reply if the node
+        # already has the current config
 
-            if node.latitude and node.longitude:
-                results.update({
-                    'latitude':     node.latitude,
-                    'longitude':    node.longitude
-                })
+        if request.if_none_match.contains(etag.strip('"')):
+            return '', 304, headers
 
-        return results, 200
+        return results, 200, headers
+
+class CheckinStats(Resource):
+
+    # Arrivals are counted in each worker process (see schedule.py), so
+    # these figures cover only the worker that answers the request, not
+    # the whole server. worker is its process id.
+
+    @admin_required
+    def get(self):
+        return dict(schedule.stats(), worker=os.getpid())
+
+class CheckinList(Resource):
+
+    parser = reqparse.RequestParser()
+    parser.add_argument('since',type=float,default=0,location='args')
+
+    # Nodes that checked in after since (epoch seconds), as uuid: time.
+    # Checkins reach the database up to CHECKIN_FLUSH_INTERVAL late
+    # from other workers, so the returned cursor lags by two intervals
+    # and clients see some checkins twice rather than miss any.
+
+    def get(self):
+        since = self.parser.parse_args()['since']
+
+        now = datetime.datetime.utcnow()
+        cursor = now - datetime.timedelta(seconds=2*checkins.interval)
+        cutoff = datetime.datetime.utcfromtimestamp(since)
+
+        rows = db.session.query(model.MeshNode.uuid, model.MeshNode.checked_on
+            ).filter(model.MeshNode.checked_on > cutoff)
+
+        nodes = {uuid: model.epoch(checked_on) for uuid, checked_on in rows}
+
+        for uuid, checked_on in checkins.since(cutoff).items():
+            nodes[uuid] = max(nodes.get(uuid, 0), model.epoch(checked_on))
+
+        return {
+            'since':    model.epoch(max(cursor, cutoff)),
+            'nodes':    nodes
+        }, 200
 
 class NodeApprove(Resource):
 
@@ -883,6 +1242,9 @@ class NodeApprove(Resource):
         args['active'] = True
 
         model.update(node,args)
+        configs.invalidate(uuid)
+
+        history.add_entry(get_jwt_identity(),'Approved node %s' % uuid)
 
         return '', 201
 
@@ -901,6 +1263,9 @@ class NodeEnable(Resource):
         args['active'] = True 
 
         model.update(node,args)
+        configs.invalidate(uuid)
+
+        history.add_entry(get_jwt_identity(),'Enabled node %s' % uuid)
 
         return '', 201
 
@@ -916,23 +1281,89 @@ class NodeDisable(Resource):
         node = lookup_node(uuid)
 
         args['updated_on'] = datetime.datetime.utcnow()
-        args['active'] = false 
+        args['active'] = False
 
         model.update(node,args)
+        configs.invalidate(uuid)
+
+        history.add_entry(get_jwt_identity(),'Disabled node %s' % uuid)
 
         return '', 201
 
 
+#-- Change Feed -----------------------------------------------
+
+class MeshChanges(Resource):
+
+    parser = reqparse.RequestParser()
+    parser.add_argument('since',type=inputs.natural,default=0,location='args')
+
+    # Groups and nodes created, changed or deleted at or after revision
+    # since. Clients apply the changes in revision order (rows are keyed
+    # by id) and pass the returned revision on the next poll.
+    #
+    # The returned revision is the oldest transaction still in flight,
+    # read before the tables, so a row committed after this poll always
+    # has a revision at or above it. Rows written by transactions that
+    # were running can be sent twice, applying them again is harmless.
+
+    def get(self):
+        since = self.parser.parse_args()['since']
+
+        Group = model.MeshGroup
+        Node = model.MeshNode
+        Tombstone = model.MeshTombstone
+
+        revision = model.changes_watermark()
+
+        horizon = db.session.query(sqlalchemy.func.max(Tombstone.revision)
+            ).filter(Tombstone.kind==model.TOMBSTONE_HORIZON
+            ).scalar()
+
+        if since and horizon is not None and since <= horizon:
+            abort(410, message=f'Deletes before revision {horizon} have been purged, reload with since=0')
+
+        group_columns = Group.serialize_columns()
+
+        groups = db.session.query(*[Group.__table__.c[f] for f in group_columns]
+            ).filter(Group.revision >= since
+            ).order_by(Group.revision)
+
+        nodes = db.session.query(*[Node.__table__.c[f] for f in node_columns]
+            ).filter(Node.revision >= since
+            ).order_by(Node.revision)
+
+        tombstones = db.session.query(
+                Tombstone.kind, Tombstone.row_id.label('id'), Tombstone.revision
+            ).filter(Tombstone.revision >= since
+            ).filter(Tombstone.kind!=model.TOMBSTONE_HORIZON
+            ).order_by(Tombstone.revision)
+
+        groups = Group.serialize_rows(groups, group_columns)
+        nodes = [merge_checkin(node) for node in Node.serialize_rows(nodes)]
+        deleted = [row._asdict() for row in tombstones]
+
+        return {
+            'revision': max(revision, since),
+            'groups':   groups,
+            'nodes':    nodes,
+            'deleted':  deleted
+        }, 200
+
 #-- Routes -------------------------------------------------
 
 api.add_resource(GroupList,         '/groups')
 api.add_resource(Group,             '/groups/<group_name>')
 api.add_resource(TunnelList,        '/tunnels')
 api.add_resource(Tunnel,            '/tunnels/<tunnel_name>')
+api.add_resource(SSHKeyList,        '/sshkeys/<username>')
 api.add_resource(NodeList,          '/nodes')
 api.add_resource(Node,              '/nodes/<uuid>')
 api.add_resource(NodeCheckin,       '/nodes/<uuid>/checkin')
 api.add_resource(NodeApprove,       '/nodes/<uuid>/approve')
 api.add_resource(NodeEnable,        '/nodes/<uuid>/enable')
 api.add_resource(NodeDisable,       '/nodes/<uuid>/disable')
+api.add_resource(CheckinList,       '/checkins')
+api.add_resource(CheckinStats,      '/checkins/stats')
+api.add_resource(MeshChanges,       '/changes')
 
@@ -0,0 +1,47 @@
+-- Keep the samples with the lowest and highest range in each time
+-- bucket so peaks survive the downsampling. The first and last
+-- samples of the range are always kept, in place of the lowest range
+-- in their bucket, so at most 2*{buckets} rows are returned.
+
+select
+    timestamp, r, az, el, lower
+from
+(
+    select
+        floor(extract(epoch from timestamp))::integer as timestamp,
+        round(r::numeric,2)::float8 as r,
+        round(az::numeric,6)::float8 as az,
+        round(el::numeric,6)::float8 as el,
+        round(lower::numeric,2)::float8 as lower,
+        bucket,
+        min(bucket) over () as first_bucket,
+        max(bucket) over () as last_bucket,
+        row_number() over (order by timestamp) as first,
+        row_number() over (order by timestamp desc) as last,
+        row_number() over (partition by bucket order by r, timestamp) as low,
+        row_number() over (partition by bucket order by r desc, timestamp) as high
+    from
+    (
+        select
+            *,
+            width_bucket(extract(epoch from timestamp),{start_ts},{stop_ts},{buckets}) as bucket
+        from
+            radar_data
+        where
+            site_id={site_id}
+            and
+            timestamp >= to_timestamp({start_ts})
+            and
+            timestamp < to_timestamp({stop_ts})
+    ) as data
+) as data
+where
+    first=1
+    or
+    last=1
+    or
+    (high=1 and not (bucket=first_bucket and bucket=last_bucket))
+    or
+    (low=1 and bucket<>first_bucket and bucket<>last_bucket)
+order by
+    timestamp
@@ -18,7 +18,7 @@ select json_agg(data) from
     from
         radar_data as data
     where
-        site_id=(select id from sites where name='{sitename}')
+        site_id={site_id}
         and
         timestamp between to_timestamp({start_ts}) and to_timestamp({stop_ts})
     order by
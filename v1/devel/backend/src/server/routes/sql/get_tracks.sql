@@ -1,22 +1,21 @@
-select json_agg(data) from
-(
-    select
-        data.id,
-        extract(epoch from timestamp) as timestamp,
-        track_id,
-        target_id,
-        round(x::numeric,2) as x, 
-        round(y::numeric,2) as y, 
-        round(z::numeric,2) as z, 
-        round(xdot::numeric,2) as xdot, 
-        round(ydot::numeric,2) as ydot, 
-        round(zdot::numeric,2) as zdot 
-    from
-        track_data as data
-    where
-        site_id=(select id from sites where name='{sitename}')
-        and
-        timestamp between to_timestamp({start_ts}) and to_timestamp({stop_ts})
-    order by
-        timestamp
-) as data
+select
+    data.id,
+    extract(epoch from timestamp)::float8 as timestamp,
+    track_id,
+    target_id,
+    round(x::numeric,2)::float8 as x, 
+    round(y::numeric,2)::float8 as y, 
+    round(z::numeric,2)::float8 as z, 
+    round(xdot::numeric,2)::float8 as xdot, 
+    round(ydot::numeric,2)::float8 as ydot, 
+    round(zdot::numeric,2)::float8 as zdot 
+from
+    track_data as data
+where
+    site_id={site_id}
+    and
+    timestamp >= to_timestamp({start_ts})
+    and
+    timestamp < to_timestamp({stop_ts})
+order by
+    timestamp
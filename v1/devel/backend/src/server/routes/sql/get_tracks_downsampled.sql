@@ -0,0 +1,75 @@
+-- Keep the first and last sample of each track in each time
+-- bucket so the track outlines are preserved. The buckets are
+-- shared out between the tracks in the range. When there are more
+-- tracks than buckets, {buckets} tracks spread evenly over the range
+-- (by start time) are kept with one bucket each, so at most
+-- 2*{buckets} rows are returned.
+
+with
+    data as (
+        select
+            *
+        from
+            track_data
+        where
+            site_id={site_id}
+            and
+            timestamp >= to_timestamp({start_ts})
+            and
+            timestamp < to_timestamp({stop_ts})
+    ),
+
+    tracks as (
+        select
+            track_id,
+            row_number() over (order by min(timestamp), track_id) as rank,
+            count(*) over () as count
+        from
+            data
+        group by
+            track_id
+    ),
+
+    kept as (
+        select
+            track_id,
+            greatest({buckets}/count,1)::integer as buckets
+        from
+            tracks
+        where
+            count <= {buckets}
+            or
+            mod((rank-1)*{buckets},count) < {buckets}
+    )
+
+select
+    id, timestamp, track_id, target_id, x, y, z, xdot, ydot, zdot
+from
+(
+    select
+        data.id,
+        extract(epoch from timestamp)::float8 as timestamp,
+        track_id,
+        target_id,
+        round(x::numeric,2)::float8 as x,
+        round(y::numeric,2)::float8 as y,
+        round(z::numeric,2)::float8 as z,
+        round(xdot::numeric,2)::float8 as xdot,
+        round(ydot::numeric,2)::float8 as ydot,
+        round(zdot::numeric,2)::float8 as zdot,
+        row_number() over (partition by track_id, bucket order by timestamp) as earliest,
+        row_number() over (partition by track_id, bucket order by timestamp desc) as latest
+    from
+    (
+        select
+            data.*,
+            width_bucket(extract(epoch from timestamp),{start_ts},{stop_ts},kept.buckets) as bucket
+        from
+            data
+            join kept using (track_id)
+    ) as data
+) as data
+where
+    earliest=1 or latest=1
+order by
+    timestamp
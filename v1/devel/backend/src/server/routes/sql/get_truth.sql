@@ -11,10 +11,8 @@ select json_agg(data) from
         round(eldot::numeric,4) as eldot 
     from
         truth_data as data
-    join
-        sites on sites.id=data.site_id
     where
-        sites.name='{sitename}'
+        data.site_id={site_id}
     order by
         timestamp
 ) as data
@@ -9,10 +9,8 @@ select json_agg(data) from (
                 extract(epoch from timestamp) as ts
             from
                 truth_data as data
-            join
-                sites on sites.id=data.site_id
             where
-                sites.name='{sitename}'
+                data.site_id={site_id}
             order by 
                 timestamp 
         ),
@@ -1,9 +1,10 @@
 #!/usr/bin/env python
 
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from flask import jsonify, request, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from flask import jsonify, request, current_app, stream_with_context
 from flask_restful import abort
-from server import model
+from server import model, columnar, roles
+from server.jsonprovider import dumpb
 
 import datetime
 import decimal
@@ -50,15 +51,113 @@ def admin_required(fn):
     @functools.wraps(fn)
     def wrapper(*args, **kwargs):
         verify_jwt_in_request()
-        username = get_jwt_identity()
-        user = model.User.query.filter_by(username=username).first()
 
-        if not user or not user.admin:
+        # Role claim from the token, confirmed by the cached current role
+
+        if get_jwt().get('role') != 'admin':
+            abort(401,message='Unuathorized')
+
+        if roles.resolve(get_jwt_identity()) != 'admin':
             abort(401,message='Unuathorized')
 
         return fn(*args, **kwargs)
     return wrapper
 
+##########################################################################
+#   Stream large query results
+#
+#   The rows are fetched in chunks through a server side cursor and
+#   written out as they arrive. The format is selected with ?format= or
+#   the Accept header:
+#
+#       json        {"<key>": [row, ...]}
+#       ndjson      newline delimited JSON (application/x-ndjson)
+#       columns     packed typed arrays (see server/columnar.py)
+##########################################################################
+
+STREAM_FORMATS = {
+    'json':     'application/json',
+    'ndjson':   'application/x-ndjson',
+    'columns':  columnar.MIMETYPE
+}
+
+def query_chunks(engine, statement, params, size):
+
+    with engine.connect() as conn:
+        result = conn.execution_options(
+                    stream_results=True,
+                    max_row_buffer=size
+                    ).execute(statement, params)
+
+        for rows in result.partitions(size):
+            yield rows
+
+def dict_chunks(chunks, columns):
+
+    keys = [name for name, kind in columns]
+
+    for rows in chunks:
+        yield [dict(zip(keys,row)) for row in rows]
+
+def stream_format():
+
+    if 'format' in request.args:
+        name = request.args['format']
+        if name not in STREAM_FORMATS:
+            abort(400,message='Unknown format: %s' % name)
+        return name
+
+    names = {mimetype: name for name, mimetype in STREAM_FORMATS.items()}
+    best = request.accept_mimetypes.best_match(list(names),'application/json')
+
+    return names[best]
+
+def stream_array(key, chunks, columns):
+
+    # json_agg() gave null rather than [] when there were no rows, so
+    # the opening bracket is held back until the first row arrives
+
+    head = b'{"%s":' % key.encode('utf-8')
+    separator = b'['
+
+    for rows in dict_chunks(chunks, columns):
+        if rows:
+            yield head + separator + dumpb(rows)[1:-1]
+            head, separator = b'', b','
+
+    if head:
+        yield head + b'null}\n'
+    else:
+        yield b']}\n'
+
+def stream_lines(chunks, columns):
+
+    for rows in dict_chunks(chunks, columns):
+        yield b''.join(dumpb(row)+b'\n' for row in rows)
+
+def stream_chunks(chunks, key, columns):
+    """Columns are the (name, type) pairs in the order of each row"""
+
+    name = stream_format()
+
+    if name == 'columns':
+        body = columnar.encode_stream(columns, chunks)
+    elif name == 'ndjson':
+        body = stream_lines(chunks, columns)
+    else:
+        body = stream_array(key, chunks, columns)
+
+    return current_app.response_class(
+                stream_with_context(body),
+                mimetype=STREAM_FORMATS[name]
+                )
+
+def stream_query(engine, statement, params, key, columns):
+
+    chunks = query_chunks(engine, statement, params, current_app.config['STREAM_CHUNK_SIZE'])
+
+    return stream_chunks(chunks, key, columns)
+
 ##########################################################################
 #   Decorator requiring a valid API key for access 
 ##########################################################################
@@ -0,0 +1,157 @@
+##########################################################################
+#
+#   Server directed checkin schedule
+#
+#   Nodes used to check in on a fixed one minute timer, so after a power
+#   event every node at a site arrived within the same second. The
+#   checkin reply now tells the node when to come back:
+#
+#       X-Checkin-Interval  seconds until the next checkin
+#       X-Checkin-Jitter    pick a random time within +/- this many
+#                           seconds of the interval
+#
+#   Pending nodes poll every CHECKIN_PENDING_INTERVAL so an approval is
+#   picked up quickly, disabled nodes every CHECKIN_IDLE_INTERVAL. Active
+#   nodes use CHECKIN_INTERVAL, stretched up to CHECKIN_MAX_INTERVAL when
+#   this worker sees more than CHECKIN_TARGET_RATE checkins a second.
+#
+#   Arrivals are counted per second over the last CHECKIN_STATS_WINDOW
+#   seconds. stats() reports how evenly they are spread, a coefficient
+#   of variation near 0 means a steady flow, a large peak_to_mean ratio
+#   means nodes are arriving in bursts. The counts are per process.
+#
+##########################################################################
+
+import math
+import threading
+import time
+
+class CheckinSchedule(object):
+
+    def __init__(self, app=None):
+        self.interval = 60
+        self.pending_interval = 15
+        self.idle_interval = 300
+        self.max_interval = 300
+        self.jitter = 0.25
+        self.target_rate = 50
+        self.window = 600
+        self.lock = threading.Lock()
+        self.reset()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = app.config.get('CHECKIN_INTERVAL', self.interval)
+        self.pending_interval = app.config.get('CHECKIN_PENDING_INTERVAL', self.pending_interval)
+        self.idle_interval = app.config.get('CHECKIN_IDLE_INTERVAL', self.idle_interval)
+        self.max_interval = app.config.get('CHECKIN_MAX_INTERVAL', self.max_interval)
+        self.jitter = app.config.get('CHECKIN_JITTER', self.jitter)
+        self.target_rate = app.config.get('CHECKIN_TARGET_RATE', self.target_rate)
+        self.window = app.config.get('CHECKIN_STATS_WINDOW', self.window)
+        self.reset()
+
+        app.extensions['schedule'] = self
+
+    def reset(self):
+        with self.lock:
+            self.counts = [0] * self.window
+            self.seconds = [None] * self.window
+            self.factor = 1
+            self.factor_second = None
+
+    #-- Arrivals ----------------------------------------------------------
+
+    def record(self, now=None):
+        """Count a checkin arriving now"""
+
+        second = int(time.time() if now is None else now)
+        slot = second % self.window
+
+        with self.lock:
+            if self.seconds[slot] != second:
+                self.seconds[slot] = second
+                self.counts[slot] = 0
+            self.counts[slot] += 1
+
+    def history(self, span, now=None):
+        # Arrivals for each of the last span complete seconds, oldest first
+
+        current = int(time.time() if now is None else now)
+        span = min(span, self.window-1)
+        first = current - span
+
+        with self.lock:
+            return [(second, self.counts[second % self.window]
+                        if self.seconds[second % self.window] == second else 0)
+                        for second in range(first, current)]
+
+    def stats(self, now=None):
+        """Summary of how evenly checkins arrived over the window"""
+
+        history = self.history(self.window, now)
+        counts = [count for second, count in history]
+        total = sum(counts)
+        mean = total / len(counts)
+
+        # The same counts folded onto the second of the minute shows
+        # nodes that are synchronized to the clock
+
+        minute = [0] * 60
+        for second, count in history:
+            minute[second % 60] += count
+
+        def variation(values):
+            average = sum(values) / len(values)
+            if not average:
+                return 0.0
+            variance = sum((v-average)**2 for v in values) / len(values)
+            return math.sqrt(variance) / average
+
+        return {
+            'window':           len(counts),
+            'arrivals':         total,
+            'rate':             mean,
+            'peak':             max(counts),
+            'peak_to_mean':     max(counts)/mean if mean else 0.0,
+            'cv':               variation(counts),
+            'minute_cv':        variation(minute),
+            'load_factor':      self.load_factor(now),
+        }
+
+    #-- Schedule ----------------------------------------------------------
+
+    def load_factor(self, now=None):
+        # Recomputed at most once a second from the last minute of arrivals
+
+        second = int(time.time() if now is None else now)
+
+        if self.factor_second != second:
+            rate = sum(count for _, count in self.history(60, now)) / 60
+            self.factor = max(1, rate / self.target_rate)
+            self.factor_second = second
+
+        return self.factor
+
+    def next_checkin(self, config, now=None):
+        """(interval, jitter) in seconds for a node with this checkin config"""
+
+        if config.get('pending'):
+            interval = self.pending_interval
+        elif not config.get('active'):
+            interval = self.idle_interval
+        else:
+            interval = min(self.interval * self.load_factor(now), self.max_interval)
+
+        interval = int(round(interval))
+
+        return interval, int(round(interval * self.jitter))
+
+    def headers(self, config, now=None):
+        interval, jitter = self.next_checkin(config, now)
+
+        return {
+            'X-Checkin-Interval':   str(interval),
+            'X-Checkin-Jitter':     str(jitter)
+        }
@@ -0,0 +1,81 @@
+##########################################################################
+#
+#   Site directory
+#
+#   The science endpoints are addressed by site name but the data
+#   tables are keyed by site_id. The sites table is small and rarely
+#   changes, so it is kept in memory and refreshed every SITE_CACHE_TTL
+#   seconds. An unknown name forces an early refresh (at most once every
+#   SITE_CACHE_RETRY seconds) so new sites show up right away.
+#
+#   The site list has every column of the table. The model only
+#   declares id and name, so the table is reflected on first use.
+#
+##########################################################################
+
+import logging
+import sqlalchemy
+import threading
+import time
+
+class SiteDirectory(object):
+
+    def __init__(self, app=None):
+        self.ttl = 300
+        self.retry = 10
+        self.lock = threading.Lock()
+        self.sites = []
+        self.ids = {}
+        self.loaded = None
+        self.table = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('SITE_CACHE_TTL', self.ttl)
+        self.retry = app.config.get('SITE_CACHE_RETRY', self.retry)
+
+        app.extensions['sites'] = self
+
+    def age(self):
+        if self.loaded is None:
+            return None
+        return time.monotonic() - self.loaded
+
+    def refresh(self):
+        from .model import db, Site
+
+        with self.lock:
+            if self.table is None:
+                self.table = sqlalchemy.Table(Site.__tablename__,
+                                sqlalchemy.MetaData(), autoload_with=db.engine)
+
+            rows = db.session.execute(sqlalchemy.select(self.table)
+                        .order_by(self.table.c.id)).mappings().all()
+
+            self.sites = [dict(row) for row in rows]
+            self.ids = {row['name']: row['id'] for row in rows}
+            self.loaded = time.monotonic()
+
+        logging.info('Loaded %d sites' % len(rows))
+
+    def check(self, ttl):
+        age = self.age()
+
+        if age is None or age >= ttl:
+            self.refresh()
+
+    def all(self):
+        self.check(self.ttl)
+        return self.sites
+
+    def resolve(self, name):
+        """Site id for name, or None if there is no such site"""
+
+        self.check(self.ttl)
+
+        if name not in self.ids:
+            self.check(self.retry)
+
+        return self.ids.get(name)
@@ -0,0 +1,235 @@
+##########################################################################
+#
+#   Time tiled cache for radar and track queries
+#
+#   Requests are split into fixed TILE_SECONDS tiles per site. Each
+#   tile is kept as packed column arrays (see columnar.py) in an LRU
+#   limited to TILE_CACHE_BYTES, and written to TILE_CACHE_DIR if one
+#   is configured so the tiles survive restarts and are shared between
+#   workers. A request is answered from the cached tiles, with one
+#   query for each run of missing tiles.
+#
+#   Only tiles that ended more than TILE_SETTLE seconds ago are cached.
+#   The data in them no longer changes so they are never invalidated.
+#   Recent tiles are always read from the database.
+#
+##########################################################################
+
+from . import columnar
+
+import array
+import bisect
+import collections
+import logging
+import os
+import threading
+import time
+import urllib.parse
+
+class TileCache(object):
+
+    def __init__(self, app=None):
+        self.seconds = 600
+        self.settle = 300
+        self.max_bytes = 256*2**20
+        self.path = None
+        self.lock = threading.Lock()
+        self.tiles = collections.OrderedDict()
+        self.size = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.seconds = app.config.get('TILE_SECONDS', self.seconds)
+        self.settle = app.config.get('TILE_SETTLE', self.settle)
+        self.max_bytes = app.config.get('TILE_CACHE_BYTES', self.max_bytes)
+        self.path = app.config.get('TILE_CACHE_DIR', self.path)
+
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+
+        app.extensions['tiles'] = self
+
+    #-- Storage -----------------------------------------------------------
+
+    def filename(self, key):
+        dataset, sitename, index = key
+        sitename = urllib.parse.quote(sitename, safe='')
+
+        return os.path.join(self.path, '%s-%s-%d-%d.tile' % (
+            dataset, sitename, self.seconds, index))
+
+    def get(self, key):
+
+        with self.lock:
+            arrays = self.tiles.get(key)
+
+            if arrays is not None:
+                self.tiles.move_to_end(key)
+                return arrays
+
+        if not self.path:
+            return None
+
+        try:
+            with open(self.filename(key), 'rb') as f:
+                columns, arrays = columnar.decode(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logging.exception('Failed to read tile %s' % (key,))
+            return None
+
+        self.store(key, arrays)
+
+        return arrays
+
+    def put(self, key, columns, arrays):
+
+        self.store(key, arrays)
+
+        if not self.path:
+            return
+
+        filename = self.filename(key)
+        tmpname = '%s.%d' % (filename, os.getpid())
+
+        try:
+            with open(tmpname, 'wb') as f:
+                f.write(columnar.encode_header(columns))
+                f.write(columnar.encode_columns(columns, len(arrays[0]), arrays))
+                f.write(columnar.encode_batch(columns, []))
+            os.replace(tmpname, filename)
+        except OSError:
+            logging.exception('Failed to write tile %s' % (key,))
+
+    def store(self, key, arrays):
+
+        size = sum(len(values)*values.itemsize for values in arrays)
+
+        with self.lock:
+            if key in self.tiles:
+                return
+
+            self.tiles[key] = arrays
+            self.size += size
+
+            while self.size > self.max_bytes and len(self.tiles) > 1:
+                key, arrays = self.tiles.popitem(last=False)
+                self.size -= sum(len(values)*values.itemsize for values in arrays)
+
+    def clear(self):
+        with self.lock:
+            self.tiles.clear()
+            self.size = 0
+
+    #-- Queries -----------------------------------------------------------
+
+    def chunks(self, dataset, sitename, start_ts, stop_ts, columns, fetch,
+               limit=None, size=5000):
+        """Yield lists of rows with start_ts <= timestamp <= stop_ts
+
+        fetch(start_ts, stop_ts) returns the rows in the half open range
+        ordered by timestamp, as chunks of row tuples in the same order
+        as columns.
+        """
+
+        # Tiles hold float64 so the values are exactly as in the database
+
+        columns = [(name, 'int64' if kind == 'int64' else 'float64')
+                    for name, kind in columns]
+
+        column = [name for name, kind in columns].index('timestamp')
+        first = int(start_ts // self.seconds)
+        last = int(stop_ts // self.seconds)
+        cutoff = time.time() - self.settle
+
+        def cacheable(index):
+            return (index+1) * self.seconds <= cutoff
+
+        def tiles():
+            missing = []
+
+            for index in range(first, last+1):
+                key = (dataset, sitename, index)
+                arrays = self.get(key) if cacheable(index) else None
+
+                if arrays is None:
+                    missing.append(index)
+                    continue
+
+                if missing:
+                    yield from self.fetch_tiles(dataset, sitename, missing[0],
+                                    missing[-1]+1, columns, fetch, cacheable)
+                    missing = []
+
+                yield arrays
+
+            if missing:
+                yield from self.fetch_tiles(dataset, sitename, missing[0],
+                                missing[-1]+1, columns, fetch, cacheable)
+
+        remaining = limit
+
+        for arrays in tiles():
+            arrays = columnar.restore_missing(columns, arrays)
+            timestamps = arrays[column]
+            lo = bisect.bisect_left(timestamps, start_ts)
+            hi = bisect.bisect_right(timestamps, stop_ts)
+
+            if remaining is not None:
+                hi = min(hi, lo+remaining)
+                remaining -= hi-lo
+
+            for pos in range(lo, hi, size):
+                end = min(pos+size, hi)
+                yield list(zip(*(values[pos:end] for values in arrays)))
+
+            if remaining == 0:
+                return
+
+    def fetch_tiles(self, dataset, sitename, start, stop, columns, fetch, cacheable):
+        # One query for a run of missing tiles, split up as the rows arrive
+
+        column = [name for name, kind in columns].index('timestamp')
+
+        def timestamp(row):
+            return row[column]
+
+        def finish(index, rows):
+            arrays = []
+
+            for n, (name, kind) in enumerate(columns):
+                values = [row[n] for row in rows]
+                if None in values:
+                    values = [columnar.MISSING[kind] if v is None else v for v in values]
+                arrays.append(array.array(columnar.TYPECODES[kind], values))
+
+            if cacheable(index):
+                self.put((dataset, sitename, index), columns, arrays)
+
+            return arrays
+
+        index = start
+        pending = []
+
+        for rows in fetch(start*self.seconds, stop*self.seconds):
+            rows = list(rows)
+
+            while rows and index < stop:
+                boundary = (index+1) * self.seconds
+                pos = bisect.bisect_left(rows, boundary, key=timestamp)
+
+                pending.extend(rows[:pos])
+                rows = rows[pos:]
+
+                if rows:
+                    yield finish(index, pending)
+                    index += 1
+                    pending = []
+
+        while index < stop:
+            yield finish(index, pending)
+            index += 1
+            pending = []
@@ -0,0 +1,139 @@
+##########################################################################
+#
+#   Write-behind queue
+#
+#   Base class for writes that are collected in memory and written out
+#   together (node checkins, audit entries). Subclasses say what the
+#   queue holds and how a batch is written:
+#
+#       empty()                 - a new, empty queue
+#       add(pending, item)      - put an item on the queue
+#       restore(pending, batch) - put back a batch that failed to write
+#       write(batch)            - write a batch to the database
+#
+#   The queue is written out when:
+#
+#       - <prefix>_FLUSH_INTERVAL seconds have passed (background thread)
+#       - <prefix>_FLUSH_SIZE items are waiting to be written
+#       - the process exits
+#
+#   Flushes from the background thread and from a request are run one
+#   at a time. A batch that fails to write is put back in front of
+#   anything queued since and tried again on the next flush.
+#
+##########################################################################
+
+import atexit
+import logging
+import threading
+import time
+
+class WriteBehind(object):
+
+    extension = None
+    config_prefix = None
+    thread_name = 'write-behind'
+    error_message = 'Failed to flush write-behind queue'
+
+    interval = 15
+    max_size = 500
+
+    def __init__(self, app=None):
+        self.app = None
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = self.empty()
+        self.oldest = None
+        self.thread = None
+        self.stopped = threading.Event()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get(self.config_prefix+'_FLUSH_INTERVAL', self.interval)
+        self.max_size = app.config.get(self.config_prefix+'_FLUSH_SIZE', self.max_size)
+
+        app.extensions[self.extension] = self
+        atexit.register(self.stop)
+
+    #-- Subclass hooks ----------------------------------------------------
+
+    def empty(self):
+        return []
+
+    def add(self, pending, item):
+        pending.append(item)
+
+    def restore(self, pending, batch):
+        pending[:0] = batch
+
+    def write(self, batch):
+        raise NotImplementedError
+
+    #-- Background thread -------------------------------------------------
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name=self.thread_name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.try_flush()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.try_flush()
+
+    def try_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logging.exception(self.error_message)
+
+    #-- Queue -------------------------------------------------------------
+
+    def queue(self, item):
+        """Add an item, flushing now if the queue is full or overdue"""
+
+        with self.lock:
+            self.add(self.pending, item)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            overdue = time.monotonic() - self.oldest >= self.interval
+            full = len(self.pending) >= self.max_size
+
+        self.start()
+
+        if full or overdue:
+            self.try_flush()
+
+    def flush(self):
+        """Write everything queued, returns the number of items written"""
+
+        with self.flush_lock:
+
+            with self.lock:
+                batch = self.pending
+                self.pending = self.empty()
+                self.oldest = None
+
+            if not batch or self.app is None:
+                return 0
+
+            try:
+                self.write(batch)
+            except Exception:
+                with self.lock:
+                    self.restore(self.pending, batch)
+                    if self.oldest is None:
+                        self.oldest = time.monotonic()
+                raise
+
+            return len(batch)
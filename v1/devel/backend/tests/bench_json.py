@@ -0,0 +1,95 @@
+"""JSON encoding benchmarks (run with make bench)
+
+Encodes a node list and a radar payload with the old Encoder class,
+with Flask's default provider (what jsonify() actually used, since
+Flask ignores app.json_encoder) and with FastJSONProvider, using
+orjson and the standard library fallback.
+"""
+
+import datetime
+import decimal
+import importlib.util
+import json
+import sys
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+from server import jsonprovider
+
+pytest.importorskip('pytest_benchmark')
+
+NODES = 10000
+SAMPLES = 100000
+
+class Encoder(json.JSONEncoder):
+    # The json.JSONEncoder subclass server/__init__.py set as
+    # app.json_encoder before the JSON provider
+
+    def default(self, o):
+        if isinstance(o, decimal.Decimal):
+            return float(o)
+        elif isinstance(o, datetime.datetime):
+            return int(o.strftime('%s'))
+        return super(Encoder, self).default(o)
+
+def node_list():
+    now = datetime.datetime(2026, 10, 18, 12, 0, 0)
+
+    return [dict(id=n, group_id=1, tunnel_id=1, uuid=f'node-{n}',
+                 name=f'Node {n}', label='', ssh_port=2200+2*n,
+                 ssh_port_alt=2201+2*n, latitude=65.1, longitude=-147.5,
+                 pending=False, active=True, update=False,
+                 created_on=now, updated_on=now, checked_on=now)
+            for n in range(NODES)]
+
+def radar():
+    return dict(radar=[dict(timestamp=1792324800+n//10, r=1234.56, az=1.234567,
+                            el=0.123456, lower=decimal.Decimal('12.34'))
+                       for n in range(SAMPLES)])
+
+PAYLOADS = {'nodes': node_list, 'radar': radar}
+
+@pytest.fixture(scope='module', params=PAYLOADS)
+def payload(request):
+    return request.param, PAYLOADS[request.param]()
+
+@pytest.fixture(scope='module')
+def stdlib():
+    # jsonprovider loaded again with orjson hidden
+
+    saved = sys.modules.get('orjson')
+    sys.modules['orjson'] = None
+
+    try:
+        spec = importlib.util.spec_from_file_location('jsonprovider_stdlib',
+                    jsonprovider.__file__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        if saved is None:
+            del sys.modules['orjson']
+        else:
+            sys.modules['orjson'] = saved
+
+    return module
+
+def check(benchmark, name, fn, obj):
+    benchmark.group = name
+    result = benchmark(fn, obj)
+    assert len(result) > 1000
+
+def test_encoder(benchmark, payload):
+    check(benchmark, payload[0], lambda obj: json.dumps(obj, cls=Encoder), payload[1])
+
+def test_flask_default(benchmark, app, payload):
+    provider = DefaultJSONProvider(app)
+    check(benchmark, payload[0], provider.dumps, payload[1])
+
+def test_fast_orjson(benchmark, payload):
+    if jsonprovider.orjson is None:
+        pytest.skip('orjson is not installed')
+    check(benchmark, payload[0], jsonprovider.dumpb, payload[1])
+
+def test_fast_stdlib(benchmark, stdlib, payload):
+    check(benchmark, payload[0], stdlib.dumpb, payload[1])
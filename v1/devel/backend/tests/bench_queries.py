@@ -0,0 +1,77 @@
+"""SQL template benchmarks (run with make bench)
+
+Compares the per-request open/read/format of routes/sql/get_radar.sql
+with queries.get(), with and without the development reload check.
+With TINCAN_TEST_DB pointing at Postgres the statements are also run
+against a small temporary radar_data table.
+"""
+
+import pytest
+import sqlalchemy
+
+from server import queries
+
+pytest.importorskip('pytest_benchmark')
+
+PARAMS = dict(site_id=1, start_ts=1792324800, stop_ts=1792328400)
+
+def read_format():
+    # What api.get_radar did on every request before the SQL templates
+    # were loaded once: read the file and format the values into it
+
+    with open(queries.filename('get_radar')) as f:
+        sql = f.read()
+    return sql.format(**PARAMS)
+
+#-- Statement preparation ----------------------------------------------
+
+@pytest.mark.benchmark(group='prepare')
+def test_read_format(benchmark, app):
+    assert 'site_id=1' in benchmark(read_format)
+
+@pytest.mark.benchmark(group='prepare')
+def test_read_format_text(benchmark, app):
+    benchmark(lambda: sqlalchemy.text(read_format()))
+
+@pytest.mark.benchmark(group='prepare')
+def test_registry(benchmark, app):
+    queries.reload = False
+    assert benchmark(queries.get, 'get_radar') is queries.get('get_radar')
+
+@pytest.mark.benchmark(group='prepare')
+def test_registry_reload_check(benchmark, app):
+    queries.reload = True
+    try:
+        assert benchmark(queries.get, 'get_radar') is queries.get('get_radar')
+    finally:
+        queries.reload = False
+
+#-- Prepare and execute (Postgres) -------------------------------------
+
+@pytest.fixture
+def radar(postgres):
+    with postgres.connect() as conn:
+        conn.exec_driver_sql('''
+            create temporary table radar_data as
+            select
+                1 as site_id,
+                to_timestamp(1792324800+n/10.0) as timestamp,
+                1234.56 as r, 1.234567 as az, 0.123456 as el, 12.34 as lower
+            from
+                generate_series(0,999) as n
+        ''')
+        yield conn
+
+@pytest.mark.benchmark(group='execute')
+def test_execute_formatted(benchmark, radar):
+    def fn():
+        return radar.exec_driver_sql(read_format()).fetchall()
+
+    assert len(benchmark(fn)) == 1000
+
+@pytest.mark.benchmark(group='execute')
+def test_execute_registry(benchmark, radar):
+    def fn():
+        return radar.execute(queries.get('get_radar'), PARAMS).fetchall()
+
+    assert len(benchmark(fn)) == 1000
@@ -0,0 +1,104 @@
+"""Model serializer benchmarks (run with make bench)
+
+Compares the compiled serializers with the per-row inspect() they
+replaced, on BENCH_ROWS (default 10000) mesh nodes.
+"""
+
+import datetime
+import json
+import os
+
+import pytest
+from sqlalchemy.inspection import inspect
+
+from server import db, model
+
+pytest.importorskip('pytest_benchmark')
+
+ROWS = int(os.getenv('BENCH_ROWS', 10000))
+
+def inspect_serialize(node):
+    # Per-row Serializer.serialize and MeshNode.serialize as they were
+    # before the compiled serializers, inspecting each object
+
+    d = {c: getattr(node, c) for c in inspect(node).attrs.keys()}
+    del d['sshkey']
+    del d['tunnel']
+    return d
+
+@pytest.fixture
+def nodes(app):
+    group = model.MeshGroup(name='group', ssh_user='tincan')
+    tunnel = model.MeshTunnel(name='tunnel', description='Tunnel')
+    db.session.add_all([group, tunnel])
+    db.session.flush()
+
+    now = datetime.datetime.utcnow()
+
+    db.session.execute(model.MeshNode.__table__.insert(), [
+        dict(group_id=group.id, tunnel_id=tunnel.id, uuid=f'node-{n}',
+             name=f'Node {n}', label='', sshkey=f'ssh-ed25519 KEY{n}',
+             ssh_port=2200+2*n, ssh_port_alt=2201+2*n,
+             latitude=65.1, longitude=-147.5,
+             pending=False, active=True, update=False,
+             created_on=now, updated_on=now, checked_on=now)
+        for n in range(ROWS)])
+
+    db.session.commit()
+
+def run(benchmark, fn):
+    # A fresh session each round so objects are loaded every time
+
+    result = benchmark.pedantic(fn, setup=db.session.expunge_all, rounds=5)
+    assert len(result) == ROWS
+
+#-- Query and serialize ------------------------------------------------
+
+@pytest.mark.benchmark(group='node list')
+def test_inspect_json_round_trip(benchmark, nodes):
+    def fn():
+        rows = model.MeshNode.query.order_by(model.MeshNode.id).all()
+        return json.loads(json.dumps([inspect_serialize(n) for n in rows], default=str))
+
+    run(benchmark, fn)
+
+@pytest.mark.benchmark(group='node list')
+def test_serialize_list(benchmark, nodes):
+    def fn():
+        rows = model.MeshNode.query.order_by(model.MeshNode.id).all()
+        return model.MeshNode.serialize_list(rows)
+
+    run(benchmark, fn)
+
+@pytest.mark.benchmark(group='node list')
+def test_serialize_rows(benchmark, nodes):
+    Node = model.MeshNode
+    columns = Node.serialize_columns()
+
+    def fn():
+        rows = db.session.query(*[Node.__table__.c[c] for c in columns]
+                    ).order_by(Node.id).all()
+        return Node.serialize_rows(rows, columns)
+
+    run(benchmark, fn)
+
+#-- Serialization alone (objects already loaded) -----------------------
+
+@pytest.fixture
+def loaded(nodes):
+    return model.MeshNode.query.order_by(model.MeshNode.id).all()
+
+@pytest.mark.benchmark(group='serialize only')
+def test_inspect_only(benchmark, loaded):
+    # The round trip is what made the old output JSON ready
+
+    def fn():
+        return json.loads(json.dumps([inspect_serialize(n) for n in loaded], default=str))
+
+    result = benchmark(fn)
+    assert len(result) == ROWS
+
+@pytest.mark.benchmark(group='serialize only')
+def test_serialize_only(benchmark, loaded):
+    result = benchmark(model.MeshNode.serialize_list, loaded)
+    assert len(result) == ROWS
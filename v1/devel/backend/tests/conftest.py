@@ -0,0 +1,128 @@
+import itertools
+import os
+
+import pytest
+import sqlalchemy
+
+os.environ['FLASK_MODE'] = 'testing'
+
+from server import create_app, db, model, revoked, sites
+
+#-- SQLite stand-ins -------------------------------------------------
+
+# The schema uses Postgres sequences and txid_current() as defaults.
+# SQLite has neither, so tests give ssh ports explicitly and revisions
+# come from a counter registered as txid_current(). Set TINCAN_TEST_DB
+# to run against Postgres instead.
+
+def sqlite_schema(metadata):
+    for table in metadata.tables.values():
+        for column in table.columns:
+            default = column.server_default
+            if default is None or isinstance(default.arg, str):
+                continue
+            if isinstance(default.arg, sqlalchemy.sql.functions.next_value):
+                column.server_default = None
+            elif 'txid_current' in str(default.arg):
+                column.server_default = None
+                sqlalchemy.schema.ColumnDefault(
+                    sqlalchemy.func.txid_current())._set_parent_with_dispatch(column)
+
+def sqlite_functions(engine):
+    # SQLite runs one writer at a time, so nothing is ever in flight
+    # and the snapshot xmin is simply the next transaction id
+
+    counter = itertools.count(1)
+    last = [0]
+
+    def txid_current():
+        last[0] = next(counter)
+        return last[0]
+
+    @sqlalchemy.event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function('txid_current', 0, txid_current)
+        dbapi_connection.create_function('txid_current_snapshot', 0, lambda: None)
+        dbapi_connection.create_function('txid_snapshot_xmin', 1, lambda s: last[0]+1)
+
+#-- Fixtures ---------------------------------------------------------
+
+@pytest.fixture
+def app():
+    app = create_app()
+
+    with app.app_context():
+        engines = [db.engine, db.engines['users']]
+
+        if engines[0].dialect.name == 'sqlite':
+            sqlite_schema(db.metadata)
+            for engine in engines:
+                sqlite_functions(engine)
+
+        db.create_all()
+
+        # The revoked tokens and sites are per process, load them from
+        # this database
+
+        revoked.refreshed = None
+        sites.table = sites.loaded = None
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def apikey(app):
+    return {'MESH-APIKEY': app.config['API_KEY']}
+
+@pytest.fixture
+def queries(app):
+    """List of SQL statements run on the main database"""
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sqlalchemy.event.listen(db.engine, 'before_cursor_execute', count)
+    yield statements
+    sqlalchemy.event.remove(db.engine, 'before_cursor_execute', count)
+
+@pytest.fixture
+def postgres(app):
+    if db.engine.dialect.name != 'postgresql':
+        pytest.skip('needs TINCAN_TEST_DB pointing at Postgres')
+    return db.engine
+
+@pytest.fixture
+def users(app):
+    """An admin and a member, both with the password 'secret'"""
+
+    admin = model.Role(name='admin', description='Administrator')
+    member = model.Role(name='member', description='Member')
+
+    for name, role in [('admin', admin), ('member', member)]:
+        db.session.add(model.User(username=name, password='secret',
+                        email=f'{name}@example.com', role=role,
+                        pending=False, active=True))
+
+    db.session.commit()
+
+    return {user.username: user for user in model.User.query}
+
+@pytest.fixture
+def login(client, users):
+    """Tokens for a user, from POST /api/auth/login"""
+
+    def login(username):
+        reply = client.post('/api/auth/login',
+                    json=dict(username=username, password='secret'))
+        assert reply.status_code == 200
+        return reply.json
+
+    return login
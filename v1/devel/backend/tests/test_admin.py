@@ -0,0 +1,60 @@
+from flask_jwt_extended import decode_token
+
+from server import db, model, roles
+
+def bearer(token):
+    return {'Authorization': f'bearer {token}'}
+
+def set_role(username, name):
+    user = model.User.query.filter_by(username=username).one()
+    user.role = model.Role.query.filter_by(name=name).one()
+    db.session.commit()
+    roles.invalidate(username)
+
+def test_member_is_refused(client, login):
+    token = login('member')['access_token']
+
+    assert client.get('/api/admin/users', headers=bearer(token)).status_code == 401
+
+def test_admin_is_allowed(client, login):
+    token = login('admin')['access_token']
+
+    reply = client.get('/api/admin/users', headers=bearer(token))
+
+    assert reply.status_code == 200
+    assert [user['username'] for user in reply.json['users']] == ['admin', 'member']
+
+def test_demoted_admin_token_is_refused(client, login):
+    token = login('admin')['access_token']
+    assert client.get('/api/admin/users', headers=bearer(token)).status_code == 200
+
+    set_role('admin', 'member')
+
+    assert client.get('/api/admin/users', headers=bearer(token)).status_code == 401
+
+def test_refresh_reissues_the_role(app, client, login):
+    tokens = login('member')
+
+    set_role('member', 'admin')
+
+    # The old token still carries the member role
+
+    assert client.get('/api/admin/users', headers=bearer(tokens['access_token'])).status_code == 401
+
+    reply = client.post('/api/auth/refresh', headers=bearer(tokens['refresh_token']))
+    assert reply.status_code == 200
+
+    token = reply.json['access_token']
+    assert decode_token(token)['role'] == 'admin'
+    assert client.get('/api/admin/users', headers=bearer(token)).status_code == 200
+
+def test_inactive_user_cannot_refresh(client, login):
+    tokens = login('member')
+
+    user = model.User.query.filter_by(username='member').one()
+    user.active = False
+    db.session.commit()
+    roles.invalidate('member')
+
+    reply = client.post('/api/auth/refresh', headers=bearer(tokens['refresh_token']))
+    assert reply.status_code == 401
@@ -0,0 +1,119 @@
+import datetime
+import time
+
+import pytest
+import sqlalchemy
+
+from server import db, model, checkins
+
+def make_node(uuid='node-1', port=2200):
+    group = model.MeshGroup.query.filter_by(name='group').first()
+
+    if not group:
+        group = model.MeshGroup(name='group', ssh_user='tincan')
+        db.session.add(group)
+        db.session.flush()
+
+    node = model.MeshNode(group_id=group.id, uuid=uuid, name=uuid,
+                ssh_port=port, ssh_port_alt=port+1)
+    db.session.add(node)
+    db.session.commit()
+
+    return node
+
+def changes(client, since=0, status=200):
+    reply = client.get(f'/api/mesh/changes?since={since}')
+    assert reply.status_code == status
+    return reply.json
+
+def test_changes_since_revision(app, client):
+    make_node()
+
+    first = changes(client)
+    assert [n['uuid'] for n in first['nodes']] == ['node-1']
+    assert [g['name'] for g in first['groups']] == ['group']
+
+    node = model.MeshNode.query.filter_by(uuid='node-1').one()
+    node.name = 'renamed'
+    db.session.commit()
+
+    second = changes(client, first['revision'])
+    assert [n['name'] for n in second['nodes']] == ['renamed']
+    assert second['groups'] == []
+    assert second['revision'] >= first['revision']
+
+def test_deleted_rows(app, client):
+    node = make_node()
+    since = changes(client)['revision']
+
+    db.session.delete(node)
+    db.session.commit()
+
+    reply = changes(client, since)
+    assert reply['deleted'] == [{'kind': 'node', 'id': node.id,
+                                 'revision': reply['deleted'][0]['revision']}]
+
+def test_purged_tombstones(app, client):
+    node = make_node()
+    db.session.delete(node)
+    db.session.commit()
+
+    since = changes(client)['revision']
+
+    old = datetime.datetime.utcnow() - datetime.timedelta(days=60)
+    model.MeshTombstone.query.update({'deleted_on': old})
+    db.session.commit()
+
+    with db.engine.begin() as conn:
+        assert model.purge_tombstones(conn, 30) == 1
+
+    horizon = model.MeshTombstone.query.one()
+    assert horizon.kind == model.TOMBSTONE_HORIZON
+
+    changes(client, horizon.revision, status=410)
+    assert changes(client, horizon.revision+1)['deleted'] == []
+    assert changes(client, 0)['deleted'] == []
+
+def test_in_flight_write_is_not_skipped(postgres, client):
+    node = make_node()
+    since = changes(client)['revision']
+
+    # A write that has started but not committed while the client polls
+
+    conn = postgres.connect()
+    writer = conn.begin()
+    conn.execute(sqlalchemy.text(
+        "update mesh_node set name='late', revision=txid_current() where id=:id"),
+        id=node.id)
+
+    later = make_node('node-2', 2300)
+
+    reply = changes(client, since)
+    assert [n['uuid'] for n in reply['nodes']] == ['node-2']
+
+    writer.commit()
+    conn.close()
+
+    reply = changes(client, reply['revision'])
+    assert 'late' in [n['name'] for n in reply['nodes']]
+
+def test_heartbeat_keeps_revision(postgres, client, apikey):
+    node = make_node()
+    since = changes(client)['revision']
+
+    checkins.record(node.uuid)
+    assert checkins.flush() == 1
+
+    assert changes(client, since)['nodes'] == []
+
+def test_checkin_list(app, client):
+    make_node()
+
+    checkins.record('node-1')
+
+    reply = client.get('/api/mesh/checkins?since=%d' % (time.time() - 60))
+    assert reply.status_code == 200
+    assert 'node-1' in reply.json['nodes']
+    assert reply.json['since'] <= time.time() - checkins.interval
+
+    checkins.pending.clear()
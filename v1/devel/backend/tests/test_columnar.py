@@ -0,0 +1,36 @@
+import math
+
+from server import columnar
+from server.tilecache import TileCache
+
+COLUMNS = [('timestamp', 'int64'), ('target_id', 'int64'), ('r', 'float32')]
+
+ROWS = [(100, 0, 1.5), (101, None, None), (102, 7, 2.5)]
+
+def test_null_integers_are_not_zero():
+    stream = b''.join(columnar.encode_stream(COLUMNS, [ROWS]))
+    columns, arrays = columnar.decode(stream)
+
+    assert columns == COLUMNS
+    assert list(arrays[1]) == [0, columnar.MISSING['int64'], 7]
+    assert math.isnan(arrays[2][1])
+
+    restored = columnar.restore_missing(columns, arrays)
+    assert restored[1] == [0, None, 7]
+    assert restored[0] is arrays[0]
+
+def test_cached_tiles_keep_null_integers():
+    tiles = TileCache()
+    tiles.settle = -tiles.seconds
+
+    def fetch(start_ts, stop_ts):
+        yield [row for row in ROWS if start_ts <= row[0] < stop_ts]
+
+    for attempt in range(2):
+        rows = [row for chunk in tiles.chunks('tracks', 'site', 100, 102, COLUMNS, fetch)
+                for row in chunk]
+
+        assert [row[:2] for row in rows] == [(100, 0), (101, None), (102, 7)]
+        assert math.isnan(rows[1][2])
+
+    assert len(tiles.tiles) == 1
@@ -0,0 +1,101 @@
+import pytest
+
+from server import queries
+from server.routes.api import downsample_buckets
+
+START = 1792324800
+STOP = START + 3600
+
+@pytest.fixture
+def conn(postgres):
+    with postgres.connect() as conn:
+        yield conn
+
+def run(conn, name, max_points, start_ts=START, stop_ts=STOP):
+    buckets = downsample_buckets(dict(max_points=max_points), start_ts, stop_ts)
+    params = dict(site_id=1, start_ts=start_ts, stop_ts=stop_ts, buckets=buckets)
+    return conn.execute(queries.get(name), params).fetchall()
+
+#-- Radar ---------------------------------------------------------------
+
+@pytest.fixture
+def radar(conn):
+    # One sample a second over the hour, plus one exactly at STOP that
+    # is outside the half open range
+
+    conn.exec_driver_sql('''
+        create temporary table radar_data as
+        select
+            1 as site_id,
+            to_timestamp(%d+n) as timestamp,
+            mod(n*7919,1000)::float8 as r,
+            0.0::float8 as az, 0.0::float8 as el, 0.0::float8 as lower
+        from
+            generate_series(0,3600) as n
+    ''' % START)
+    conn.exec_driver_sql('analyze radar_data')
+    return conn
+
+@pytest.mark.parametrize('max_points', [2, 3, 10, 101, 1000, 10000])
+def test_radar_stays_within_max_points(radar, max_points):
+    rows = run(radar, 'get_radar_downsampled', max_points)
+
+    assert 2 <= len(rows) <= max_points
+    assert rows[0].timestamp == START
+    assert rows[-1].timestamp == STOP-1
+
+def test_radar_keeps_peaks(radar):
+    rows = run(radar, 'get_radar_downsampled', 100)
+
+    ranges = [row.r for row in rows]
+    assert 999 in ranges
+    assert 0 in ranges
+
+#-- Tracks --------------------------------------------------------------
+
+def tracks(conn, count, length):
+    # count tracks starting evenly over the hour, one sample a second
+
+    conn.exec_driver_sql('''
+        create temporary table track_data as
+        select
+            row_number() over () as id,
+            1 as site_id,
+            to_timestamp(%d + t*(3600/%d) + n) as timestamp,
+            t as track_id, t as target_id,
+            n::float8 as x, 0.0::float8 as y, 0.0::float8 as z,
+            0.0::float8 as xdot, 0.0::float8 as ydot, 0.0::float8 as zdot
+        from
+            generate_series(0,%d) as t,
+            generate_series(0,%d) as n
+    ''' % (START, count, count-1, length-1))
+
+    # Temporary tables are not analyzed by autovacuum
+
+    conn.exec_driver_sql('analyze track_data')
+    return conn
+
+@pytest.mark.parametrize('count,max_points', [(5, 100), (50, 100), (400, 100), (400, 7)])
+def test_tracks_cover_the_whole_range(conn, count, max_points):
+    tracks(conn, count, 60)
+    rows = run(conn, 'get_tracks_downsampled', max_points)
+
+    assert len(rows) <= max_points
+
+    # The tracks kept are spread over the range, not cut off at the end
+
+    buckets = max_points//2
+    kept = sorted({row.track_id for row in rows})
+
+    assert len(kept) == min(count, buckets)
+    assert kept[0] == 0
+    assert kept[-1] >= count - 1 - -(-count//buckets)
+    assert rows[-1].timestamp == START + kept[-1]*(3600//count) + 59
+
+def test_tracks_keep_both_ends(conn):
+    tracks(conn, 5, 600)
+    rows = run(conn, 'get_tracks_downsampled', 100)
+
+    for track_id in range(5):
+        x = [row.x for row in rows if row.track_id == track_id]
+        assert min(x) == 0 and max(x) == 599
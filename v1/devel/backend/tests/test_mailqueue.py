@@ -0,0 +1,110 @@
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+from flask_mail import Message
+
+from server import db, model, mailqueue
+
+class Inbox(object):
+
+    def __init__(self):
+        self.messages = []
+        self.reject = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.reject:
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.mail_from, envelope.rcpt_tos, envelope.content))
+        return '250 Message accepted'
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+@pytest.fixture
+def smtpd(app, monkeypatch):
+    # Dispatch is called directly, keep the background sender out of it
+
+    if mailqueue.thread:
+        mailqueue.stop()
+        mailqueue.thread.join()
+
+    monkeypatch.setattr(mailqueue, 'start', lambda: None)
+
+    inbox = Inbox()
+    controller = Controller(inbox, hostname='127.0.0.1', port=free_port())
+    controller.start()
+
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=controller.port,
+                      MAIL_USE_TLS=False, MAIL_USE_SSL=False, MAIL_USERNAME=None)
+
+    yield inbox
+
+    controller.stop()
+
+def queue(subject, recipient):
+    message = Message(subject, sender='no-reply@example.com', recipients=[recipient])
+    message.body = 'Hello'
+    mailqueue.enqueue(message)
+
+def test_enqueue_waits_for_commit(app, smtpd):
+    queue('Welcome', 'user@example.com')
+
+    assert not mailqueue.wake.is_set()
+    db.session.rollback()
+
+    assert model.OutboundMail.query.count() == 0
+
+    queue('Welcome', 'user@example.com')
+    db.session.commit()
+
+    assert mailqueue.wake.is_set()
+    mailqueue.wake.clear()
+
+def test_dispatch_sends_batch(app, smtpd):
+    for n in range(3):
+        queue(f'Message {n}', f'user{n}@example.com')
+    db.session.commit()
+
+    assert mailqueue.dispatch() == 3
+
+    assert [rcpt for sender, rcpt, content in smtpd.messages] == \
+        [['user0@example.com'], ['user1@example.com'], ['user2@example.com']]
+    assert b'Subject: Message 0' in smtpd.messages[0][2]
+    assert model.OutboundMail.query.count() == 0
+
+def test_rejected_message_is_deferred(app, smtpd):
+    smtpd.reject.add('gone@example.com')
+
+    queue('Bounce', 'gone@example.com')
+    queue('Hello', 'user@example.com')
+    db.session.commit()
+
+    mailqueue.dispatch()
+
+    assert len(smtpd.messages) == 1
+
+    db.session.expire_all()
+    entry = model.OutboundMail.query.one()
+    assert entry.recipients == 'gone@example.com'
+    assert entry.attempts == 1
+    assert '550' in entry.last_error
+
+def test_server_down_defers_everything(app, smtpd):
+    app.config['MAIL_PORT'] = free_port()
+
+    queue('Hello', 'user@example.com')
+    db.session.commit()
+
+    assert mailqueue.dispatch() == 0
+
+    db.session.expire_all()
+    entry = model.OutboundMail.query.one()
+    assert entry.attempts == 1
+    assert entry.send_after > entry.created_on
@@ -0,0 +1,71 @@
+import pytest
+
+from server import db, model
+
+def make_nodes():
+    group = model.MeshGroup(name='group', ssh_user='tincan')
+    db.session.add(group)
+    db.session.flush()
+
+    # Repeated and missing values in every nullable sort column
+
+    names = ['b', None, 'a', 'b', None, 'c', 'a', None, 'b', 'd', None]
+
+    for n, name in enumerate(names):
+        db.session.add(model.MeshNode(
+            group_id=group.id, uuid=f'node-{n}', name=name,
+            label=None if n % 3 else f'label-{n % 2}',
+            latitude=None if n % 4 == 1 else float(n % 3),
+            longitude=None if n % 2 else -147.5,
+            ssh_port=2200+2*n, ssh_port_alt=2201+2*n
+            ))
+
+    db.session.flush()
+
+    # Name and label default to '', older rows have NULLs
+
+    model.MeshNode.query.filter_by(name='').update({'name': None})
+    model.MeshNode.query.filter_by(label='').update({'label': None})
+    db.session.commit()
+
+    return len(names)
+
+def pages(client, sort, limit):
+    uuids = []
+    cursor = None
+
+    while True:
+        url = f'/api/mesh/nodes?sort={sort}&limit={limit}&fields=uuid'
+        if cursor:
+            url += f'&after={cursor}'
+
+        reply = client.get(url)
+        assert reply.status_code == 200
+
+        uuids += [row['uuid'] for row in reply.json]
+        cursor = reply.headers.get('X-Next-Cursor')
+
+        if not cursor:
+            return uuids
+
+@pytest.mark.parametrize('sort', ['name', 'label', 'latitude', 'longitude', 'id'])
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('limit', [1, 2, 4])
+def test_pages_match_full_list(app, client, sort, descending, limit):
+    count = make_nodes()
+    sort = '-' + sort if descending else sort
+
+    full = [row['uuid'] for row in
+                client.get(f'/api/mesh/nodes?sort={sort}&fields=uuid').json]
+
+    assert len(full) == count
+    assert pages(client, sort, limit) == full
+
+def test_nulls_sort_last(app, client):
+    make_nodes()
+
+    for sort in ['name', '-name']:
+        rows = client.get(f'/api/mesh/nodes?sort={sort}&fields=name').json
+        names = [row['name'] for row in rows]
+        assert names[-4:] == [None]*4
+        assert None not in names[:-4]
@@ -0,0 +1,77 @@
+import datetime
+import time
+
+from server import db, model, revoked
+
+def bearer(token):
+    return {'Authorization': f'bearer {token}'}
+
+def test_logout_revokes_both_tokens(client, login):
+    tokens = login('member')
+
+    reply = client.get('/api/auth/profile', headers=bearer(tokens['access_token']))
+    assert reply.status_code == 200
+
+    for token in tokens.values():
+        reply = client.post('/api/auth/logout', headers=bearer(token))
+        assert reply.status_code == 200
+
+    reply = client.get('/api/auth/profile', headers=bearer(tokens['access_token']))
+    assert reply.status_code == 401
+
+    reply = client.post('/api/auth/refresh', headers=bearer(tokens['refresh_token']))
+    assert reply.status_code == 401
+
+def test_blocklist_loader(app):
+    exp = int(time.time()) + 3600
+
+    revoked.revoke('local', exp)
+
+    assert revoked.check({}, {'jti': 'local'})
+    assert not revoked.check({}, {'jti': 'unknown'})
+
+def test_rows_committed_out_of_id_order_are_seen(app):
+    # Another worker's revocation with a lower id can become visible
+    # after one with a higher id has already been read
+
+    expires_on = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+    db.session.add(model.BlacklistToken(jti='later', expires_on=expires_on))
+    db.session.commit()
+    revoked.refresh()
+
+    db.session.add(model.BlacklistToken(jti='earlier', expires_on=expires_on))
+    db.session.flush()
+    row = model.BlacklistToken.query.filter_by(jti='earlier').one()
+    row.id = -1
+    db.session.commit()
+
+    revoked.refresh()
+
+    assert revoked.is_revoked('later')
+    assert revoked.is_revoked('earlier')
+
+def test_old_rows_match_the_token_string(app):
+    db.session.add(model.BlacklistToken(token='old.token.string'))
+    db.session.commit()
+    revoked.refresh()
+
+    assert model.BlacklistToken.check_blacklist('old.token.string')
+
+def test_purge_drops_expired_tokens(app):
+    now = datetime.datetime.utcnow()
+
+    db.session.add(model.BlacklistToken(jti='expired',
+                    expires_on=now - datetime.timedelta(minutes=1)))
+    db.session.add(model.BlacklistToken(jti='current',
+                    expires_on=now + datetime.timedelta(hours=1)))
+    db.session.commit()
+    revoked.refresh()
+
+    assert revoked.is_revoked('expired')
+
+    revoked.purge()
+
+    assert not revoked.is_revoked('expired')
+    assert revoked.is_revoked('current')
+    assert [row.jti for row in model.BlacklistToken.query] == ['current']
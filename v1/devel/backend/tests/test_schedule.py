@@ -0,0 +1,122 @@
+import math
+import os
+
+import pytest
+
+from server.schedule import CheckinSchedule
+
+NOW = 1792324800
+
+ACTIVE = {'pending': False, 'active': True}
+PENDING = {'pending': True, 'active': False}
+IDLE = {'pending': False, 'active': False}
+
+@pytest.fixture
+def schedule():
+    return CheckinSchedule()
+
+def arrive(schedule, rate, seconds, now=NOW):
+    # rate checkins a second over the seconds before now
+
+    for second in range(now-seconds, now):
+        for n in range(rate):
+            schedule.record(second)
+
+def test_intervals(schedule):
+    assert schedule.next_checkin(ACTIVE, NOW) == (60, 15)
+    assert schedule.next_checkin(PENDING, NOW) == (15, 4)
+    assert schedule.next_checkin(IDLE, NOW) == (300, 75)
+
+def test_headers(schedule):
+    assert schedule.headers(ACTIVE, NOW) == {
+        'X-Checkin-Interval':   '60',
+        'X-Checkin-Jitter':     '15'
+    }
+
+def test_load_below_target_does_not_stretch(schedule):
+    arrive(schedule, 50, 60)
+
+    assert schedule.load_factor(NOW) == 1
+    assert schedule.next_checkin(ACTIVE, NOW) == (60, 15)
+
+def test_load_stretches_active_interval(schedule):
+    arrive(schedule, 100, 60)
+
+    assert schedule.load_factor(NOW) == 2
+    assert schedule.next_checkin(ACTIVE, NOW) == (120, 30)
+
+    # Pending and disabled nodes keep their intervals
+
+    assert schedule.next_checkin(PENDING, NOW) == (15, 4)
+    assert schedule.next_checkin(IDLE, NOW) == (300, 75)
+
+def test_load_stretch_is_capped(schedule):
+    arrive(schedule, 1000, 60)
+
+    assert schedule.load_factor(NOW) == 20
+    assert schedule.next_checkin(ACTIVE, NOW) == (300, 75)
+
+def test_load_factor_uses_the_last_minute(schedule):
+    arrive(schedule, 1000, 60, now=NOW-120)
+
+    assert schedule.load_factor(NOW) == 1
+
+def test_stats_steady_flow(schedule):
+    arrive(schedule, 3, schedule.window)
+
+    stats = schedule.stats(NOW)
+
+    assert stats['window'] == schedule.window - 1
+    assert stats['arrivals'] == 3 * stats['window']
+    assert stats['rate'] == 3
+    assert stats['peak'] == 3
+    assert stats['peak_to_mean'] == 1
+    assert stats['cv'] == 0
+    assert stats['load_factor'] == 1
+
+def test_stats_burst(schedule):
+    schedule.window = 10
+    schedule.reset()
+
+    arrive(schedule, 2, 9)
+    for n in range(9):
+        schedule.record(NOW-1)
+
+    stats = schedule.stats(NOW)
+
+    # Eight seconds with 2 arrivals and one with 11: mean 3, sd sqrt(8)
+
+    assert stats['window'] == 9
+    assert stats['arrivals'] == 27
+    assert stats['peak'] == 11
+    assert stats['peak_to_mean'] == pytest.approx(11/3)
+    assert stats['cv'] == pytest.approx(math.sqrt(8)/3)
+
+def test_stats_minute_cv_shows_clock_synchronized_nodes(schedule):
+    # Every arrival on the first second of a minute
+
+    for second in range(NOW-schedule.window+1, NOW):
+        if second % 60 == 0:
+            schedule.record(second)
+
+    stats = schedule.stats(NOW)
+
+    assert stats['minute_cv'] == pytest.approx(math.sqrt(59))
+
+def test_stats_empty(schedule):
+    stats = schedule.stats(NOW)
+
+    assert stats['arrivals'] == 0
+    assert stats['peak_to_mean'] == 0
+    assert stats['cv'] == 0
+    assert stats['minute_cv'] == 0
+
+def test_stats_endpoint_names_the_worker(client, login):
+    token = login('admin')['access_token']
+
+    reply = client.get('/api/mesh/checkins/stats',
+                headers={'Authorization': f'bearer {token}'})
+
+    assert reply.status_code == 200
+    assert reply.json['worker'] == os.getpid()
+    assert 'cv' in reply.json
@@ -0,0 +1,28 @@
+from server import db, sites
+
+def make_sites():
+    # The real table has more columns than the model declares
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('alter table sites add column latitude float')
+        conn.exec_driver_sql('alter table sites add column description varchar')
+        conn.exec_driver_sql("insert into sites (id, name, latitude, description) "
+                             "values (1, 'poker', 65.1, 'Poker Flat'), "
+                             "(2, 'sondrestrom', 67.0, NULL)")
+
+def test_sites_list_every_column(app, client):
+    make_sites()
+
+    reply = client.get('/api/sites')
+
+    assert reply.status_code == 200
+    assert reply.json == {'sites': [
+        {'id': 1, 'name': 'poker', 'latitude': 65.1, 'description': 'Poker Flat'},
+        {'id': 2, 'name': 'sondrestrom', 'latitude': 67.0, 'description': None},
+        ]}
+
+def test_resolve(app):
+    make_sites()
+
+    assert sites.resolve('sondrestrom') == 2
+    assert sites.resolve('missing') is None
@@ -0,0 +1,171 @@
+import pytest
+from werkzeug.exceptions import NotFound
+
+from server import db, model
+from server.keylookup import KeyDirectory
+from server.routes import mesh
+
+def make_mesh(groups, nodes, username='tincan'):
+    """groups x nodes active nodes, all with keys, one user"""
+
+    port = 2200
+
+    for g in range(groups):
+        group = model.MeshGroup(name=f'group{g}', ssh_user=username)
+        db.session.add(group)
+        db.session.flush()
+
+        for n in range(nodes):
+            db.session.add(model.MeshNode(
+                group_id=group.id,
+                uuid=f'{g}-{n}',
+                sshkey=f'ssh-ed25519 AAAAKEY{g}x{n} node',
+                ssh_port=port, ssh_port_alt=port+1,
+                pending=False, active=True
+                ))
+            port += 2
+
+    db.session.commit()
+
+@pytest.mark.parametrize('groups', [1, 5, 20])
+def test_sshkeys_by_username_query_count(app, queries, groups):
+    make_mesh(groups, 3)
+    queries.clear()
+
+    keys = mesh.get_sshkeys_by_username('tincan')
+
+    assert len(keys) == groups * 3
+    assert len(queries) == 1
+
+@pytest.mark.parametrize('nodes', [1, 10, 50])
+def test_sshkeys_by_group_query_count(app, queries, nodes):
+    make_mesh(2, nodes)
+    queries.clear()
+
+    keys = mesh.get_sshkeys_by_group('group1')
+
+    assert len(keys) == nodes
+    assert len(queries) == 1
+
+def test_sshkeys_by_group_skips_inactive(app):
+    make_mesh(1, 2)
+    model.MeshNode.query.filter_by(uuid='0-0').update({'active': False})
+    db.session.commit()
+
+    assert mesh.get_sshkeys_by_group('group0') == ['ssh-ed25519 AAAAKEY0x1 node']
+
+def test_sshkeys_by_group_unknown(app):
+    make_mesh(1, 1)
+
+    with pytest.raises(NotFound):
+        mesh.get_sshkeys_by_group('missing')
+
+def test_sshkeys_by_group_without_keys(app):
+    db.session.add(model.MeshGroup(name='empty', ssh_user='tincan'))
+    db.session.commit()
+
+    assert mesh.get_sshkeys_by_group('empty') == []
+
+def test_sshkey_list_endpoint(app, client, apikey):
+    make_mesh(2, 2)
+
+    reply = client.get('/api/mesh/sshkeys/tincan', headers=apikey)
+
+    assert reply.status_code == 200
+    assert len(reply.json) == 4
+
+#-- Fingerprint lookup -------------------------------------------------
+
+# Real keys, with the fingerprints from ssh-keygen -lf
+
+KEY = 'ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIDXS+RylkD/geeu+QDme3CgUf2cs68plVkawt3gPBPP8 node'
+FINGERPRINT = 'SHA256:5pIu5Af3BlK9eFW+wYcSteKXsUrndVlxwQuAh61tpy4'
+
+OTHER_KEY = 'ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIG/DxUkgaDN6dMI9CHrbHLj5sb1dJf12n7U5jkMBvJh4 other'
+OTHER_FINGERPRINT = 'SHA256:TLk/Jvl7Zz5w0v70njOJliavMRkefeilzbiRZ3lnuZw'
+
+@pytest.fixture
+def keyed(app):
+    """The mesh from make_mesh(1, 2) with KEY on node 0-0"""
+
+    make_mesh(1, 2)
+    node = model.MeshNode.query.filter_by(uuid='0-0').one()
+    node.sshkey = KEY
+    db.session.commit()
+
+    return node
+
+def test_sshkey_fingerprint_matches_ssh_keygen():
+    assert model.sshkey_fingerprint(KEY) == FINGERPRINT
+    assert model.sshkey_fingerprint('') is None
+    assert model.sshkey_fingerprint('ssh-ed25519 not-base64!') is None
+
+@pytest.mark.parametrize('fingerprint', [
+    FINGERPRINT,
+    FINGERPRINT + '=',
+    FINGERPRINT[len('SHA256:'):],
+    FINGERPRINT[len('SHA256:'):] + '=',
+    ])
+def test_normalize_fingerprint(fingerprint):
+    assert model.normalize_fingerprint(fingerprint) == FINGERPRINT
+
+def test_fingerprint_follows_key_updates(keyed):
+    assert keyed.sshkey_fingerprint == FINGERPRINT
+
+    keyed.sshkey = OTHER_KEY
+    db.session.commit()
+
+    node = model.MeshNode.query.filter_by(uuid='0-0').one()
+    assert node.sshkey_fingerprint == OTHER_FINGERPRINT
+
+    node.sshkey = ''
+    db.session.commit()
+
+    assert node.sshkey_fingerprint is None
+
+def test_sshkeys_by_fingerprint(keyed):
+    unpadded = FINGERPRINT[len('SHA256:'):]
+
+    assert mesh.get_sshkeys_by_fingerprint('tincan', 'ssh-ed25519', FINGERPRINT) == [KEY]
+    assert mesh.get_sshkeys_by_fingerprint('tincan', 'ssh-ed25519', unpadded) == [KEY]
+
+    assert mesh.get_sshkeys_by_fingerprint('tincan', 'ssh-rsa', FINGERPRINT) == []
+    assert mesh.get_sshkeys_by_fingerprint('other', 'ssh-ed25519', FINGERPRINT) == []
+    assert mesh.get_sshkeys_by_fingerprint('tincan', 'ssh-ed25519', OTHER_FINGERPRINT) == []
+
+def test_sshkeys_by_fingerprint_skips_inactive(keyed):
+    keyed.active = False
+    db.session.commit()
+
+    assert mesh.get_sshkeys_by_fingerprint('tincan', 'ssh-ed25519', FINGERPRINT) == []
+
+def test_sshkey_list_endpoint_by_fingerprint(keyed, client, apikey):
+    url = '/api/mesh/sshkeys/tincan'
+
+    reply = client.get(url, headers=apikey,
+                query_string=dict(keytype='ssh-ed25519', fingerprint=FINGERPRINT))
+    assert reply.json == [KEY]
+
+    reply = client.get(url, headers=apikey,
+                query_string=dict(keytype='ssh-ed25519', fingerprint=OTHER_FINGERPRINT))
+    assert reply.json == []
+
+    # Without both arguments every key for the user is returned
+
+    reply = client.get(url, headers=apikey, query_string=dict(fingerprint=FINGERPRINT))
+    assert len(reply.json) == 2
+
+def test_key_directory_lookup(keyed, app):
+    directory = KeyDirectory(app)
+    directory.load()
+
+    assert directory.lookup('tincan', 'ssh-ed25519', FINGERPRINT) == [KEY]
+    assert directory.lookup('tincan', 'ssh-ed25519', FINGERPRINT[len('SHA256:'):]) == [KEY]
+    assert directory.lookup('tincan', 'ssh-rsa', FINGERPRINT) == []
+    assert directory.lookup('tincan', 'ssh-ed25519', OTHER_FINGERPRINT) == []
+
+    # Falls back to every key for the user without a fingerprint
+
+    assert sorted(directory.lookup('tincan')) == sorted(mesh.get_sshkeys_by_username('tincan'))
+    assert len(directory.lookup('tincan')) == 2
+    assert directory.lookup('other') == []
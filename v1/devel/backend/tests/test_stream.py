@@ -0,0 +1,21 @@
+import json
+
+from server.routes import util
+
+COLUMNS = [('timestamp', 'int64'), ('r', 'float64')]
+
+def body(chunks):
+    return b''.join(util.stream_array('radar', chunks, COLUMNS))
+
+def test_rows_are_streamed_as_one_array(app):
+    chunks = [[(1, 1.5), (2, 2.5)], [], [(3, 3.5)]]
+
+    assert json.loads(body(chunks)) == {'radar': [
+        {'timestamp': 1, 'r': 1.5},
+        {'timestamp': 2, 'r': 2.5},
+        {'timestamp': 3, 'r': 3.5},
+        ]}
+
+def test_no_rows_is_null_like_json_agg(app):
+    assert json.loads(body([])) == {'radar': None}
+    assert json.loads(body([[], []])) == {'radar': None}
@@ -0,0 +1,62 @@
+import datetime
+
+import pytest
+
+from server import db, model, audit
+from server.checkin import CheckinBuffer
+from server.writebehind import WriteBehind
+
+class FailingQueue(WriteBehind):
+
+    config_prefix = 'TEST'
+    extension = 'test_queue'
+    fail = True
+
+    def write(self, batch):
+        if self.fail:
+            raise RuntimeError('database is down')
+        self.written = batch
+
+def test_audit_entries_written_in_one_batch(app):
+    for n in range(5):
+        audit.record('admin', f'action {n}')
+
+    assert audit.flush() == 5
+
+    rows = model.History.query.order_by(model.History.id).all()
+    assert [row.action for row in rows] == [f'action {n}' for n in range(5)]
+
+def test_failed_batch_is_put_back_in_order(app):
+    queue = FailingQueue(app)
+    queue.queue('first')
+
+    with pytest.raises(RuntimeError):
+        queue.flush()
+
+    queue.queue('second')
+    queue.fail = False
+
+    assert queue.flush() == 2
+    assert queue.written == ['first', 'second']
+    assert queue.flush() == 0
+
+def test_failed_checkins_keep_newer_times(app):
+    old = datetime.datetime(2026, 1, 1)
+    new = datetime.datetime(2026, 1, 2)
+
+    buffer = CheckinBuffer()
+    buffer.app = app
+
+    def write(batch):
+        # A newer checkin arrives while the batch is being written
+        with buffer.lock:
+            buffer.add(buffer.pending, ('node', new))
+        raise RuntimeError('database is down')
+
+    buffer.write = write
+    buffer.record('node', old)
+
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+
+    assert buffer.checked_on('node') == new
@@ -15,10 +15,12 @@ const getMeshNodes = async () => {
 
     const response = await axios_api.get('/mesh/nodes')
 
+    // Timestamps are in seconds since 1970
+
     const result = response.data.map(entry => {
-        entry.created_on = new Date(entry.created_on)
-        entry.updated_on = new Date(entry.updated_on)
-        entry.checked_on = new Date(entry.checked_on)
+        entry.created_on = new Date(entry.created_on*1000)
+        entry.updated_on = new Date(entry.updated_on*1000)
+        entry.checked_on = new Date(entry.checked_on*1000)
         return entry
     })
 